@@ -1 +1,32 @@
-__all__ = ["base","instruments","experiments","parsers"]
+__all__ = ["base","instruments","experiments","parsers","tokenizer","cache",
+           "summary","stages","blanks","batch","watch",
+           "daemon","errors"]
+
+import sys, types
+
+class LazyPackage(types.ModuleType):
+    """
+    The aviv package.  Its submodules are imported the first time they are
+    used as attributes (e.g. aviv.parsers after "import aviv"), so importing
+    the package itself costs nothing.
+    """
+
+    def __getattr__(self,name):
+        """
+        Import a submodule that has not been imported yet.
+        """
+
+        if name not in self.__all__:
+            raise AttributeError(name)
+
+        module_name = "%s.%s" % (self.__name__,name)
+        __import__(module_name)
+
+        return sys.modules[module_name]
+
+# Stand in for this module.  The module is kept so that python 2 does not
+# clear its globals when it is no longer in sys.modules.
+package = LazyPackage(__name__,__doc__)
+package.__dict__.update(globals())
+package.module = sys.modules[__name__]
+sys.modules[__name__] = package
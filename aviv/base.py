@@ -2,15 +2,10 @@ __description__ = """"""
 __author__ = "Michael J. Harms"
 __date__ = ""
 
-import sys, os
-import parsers
-
-class AvivError(Exception):
-    """
-    General error class for this module.
-    """
-
-    pass
+import sys, os, time, weakref, cStringIO
+import numpy
+import tokenizer, stages, blanks
+from errors import AvivError
 
 
 class ConfigAttribute:
@@ -35,64 +30,497 @@ class ConfigAttribute:
         self.type = type
         self.format = format
 
+    def bind(self,raw_value):
+        """
+        Attach the unconverted text found after the key in the file.  It is
+        converted to self.type the first time self.value is used.
+        """
+
+        self.raw_value = raw_value
+        self.__dict__.pop("value",None)
+
+    def convert(self,raw_value):
+        """
+        Convert the text found after the key in the file to self.type.  If the
+        value has multiple parts (i.e. date), return a list.  Otherwise,
+        return a single value.
+        """
+
+        if raw_value == None:
+            return []
+
+        try:
+            values = [self.type(v.strip()) for v in raw_value.split(":")]
+        except ValueError:
+            err = "Could not read value \"%s\" for %s!" % (raw_value.strip(),
+                                                          self.aviv_key)
+            raise AvivError(err)
+
+        if len(values) == 1:
+            return values[0]
+
+        return values
+
+    def __getattr__(self,name):
+        """
+        Convert the bound value the first time it is asked for.
+        """
+
+        if name == "value" and "raw_value" in self.__dict__:
+            self.value = self.convert(self.raw_value)
+            return self.value
+
+        raise AttributeError(name)
+
+
+class ReadOnlyDict(dict):
+    """
+    Dictionary that can't be changed once it has been created.
+    """
+
+    def refuse(self,*args,**kwargs):
+        """
+        Refuse to change the dictionary.
+        """
+
+        err = "RawExperiment instances cannot be modified!"
+        raise AvivError(err)
+
+    __setitem__ = __delitem__ = refuse
+    clear = pop = popitem = setdefault = update = refuse
+
+
+class RawExperiment:
+    """
+    Class that holds everything read from an Aviv experiment file before any
+    processing is done: the instrument and experiment type, the summary and
+    configuration lines (with config, an index of the configuration keys),
+    and the data blocks as a read-only (n_blocks x n_rows x n_columns)
+    array.  Instances, including their dictionaries and arrays, cannot be
+    modified, so one can be safely handed to any number of parsers in place
+    of the file.
+    """
+
+    def __init__(self,input_file,instrument,exp_type,summary_lines,
+                 config_lines,section_offsets,columns,blocks,block_stats,
+                 bad_cells):
+        """
+        Initialize instance of class.
+        """
+
+        blocks.flags.writeable = False
+        for value in block_stats.values():
+            value.flags.writeable = False
+
+        self.__dict__.update([("input_file",input_file),
+                              ("instrument",instrument),
+                              ("exp_type",exp_type),
+                              ("summary_lines",tuple(summary_lines)),
+                              ("config_lines",tuple(config_lines)),
+                              ("config",ReadOnlyDict(
+                               tokenizer.indexConfiguration(config_lines))),
+                              ("section_offsets",tuple(section_offsets)),
+                              ("columns",tuple(columns)),
+                              ("blocks",blocks),
+                              ("block_stats",ReadOnlyDict(block_stats)),
+                              ("bad_cells",tuple(bad_cells))])
+
+    def __setattr__(self,name,value):
+        """
+        Refuse to change any attribute.
+        """
+
+        err = "RawExperiment instances cannot be modified!"
+        raise AvivError(err)
+
+    def __delattr__(self,name):
+        """
+        Refuse to delete any attribute.
+        """
+
+        err = "RawExperiment instances cannot be modified!"
+        raise AvivError(err)
+
+
+def titrantConcentrations(shot_size,init_conc,titrant_conc,cell_vol):
+    """
+    Calculate the titrant concentration after each shot of a titration.
+    Each shot of s mL of titrant (at titrant_conc) replaces s mL of the
+    cell_vol mL in the cuvette, so
+
+        titrant[i] = titrant[i-1]*(cell_vol - s[i])/cell_vol +
+                     s[i]*titrant_conc/cell_vol
+
+    starting from init_conc (the first shot is not applied).  Each shot
+    moves the concentration a fraction of the way to titrant_conc, so with
+    a[i] = (cell_vol - s[i])/cell_vol this is
+
+        titrant[i] = titrant_conc + (init_conc - titrant_conc)*a[1]*...*a[i]
+
+    which is evaluated with a cumulative product rather than one shot at a
+    time.  Nothing is divided by the product, so a shot that fills the cell
+    (a[i] = 0) or a run of shots long enough for the product to underflow is
+    handled correctly.
+
+    shot_size holds the shot sizes in uL along its last axis.  It and the
+    other arguments are broadcast against each other, so passing arrays of
+    candidate init_conc, titrant_conc or cell_vol values (or a stack of
+    shot_size rows from several files) corrects them all in one call: for
+    example, titrant_conc with shape (m,1) and shot_size with shape (n,)
+    give an (m,n) array.
+    """
+
+    shot_size = numpy.asarray(shot_size,dtype=float)/1000
+    init_conc = numpy.asarray(init_conc,dtype=float)
+    titrant_conc = numpy.asarray(titrant_conc,dtype=float)
+    cell_vol = numpy.asarray(cell_vol,dtype=float)
+
+    # Nothing is added before the first point
+    dilution = (cell_vol - shot_size)/cell_vol
+    dilution[...,0] = 1.0
+
+    return titrant_conc + (init_conc - titrant_conc)*numpy.cumprod(dilution,
+                                                                   axis=-1)
+
+
+def darkQCStep(y,y_err,dark_signal,qc_signal):
+    """
+    Correct a signal for dark and qc signals.
+    """
+
+    return (y - dark_signal)/qc_signal, y_err
+
 
-class Channel:
+def titrantBlankStep(y,y_err,buffer_signal,titrant_signal,concentrations):
+    """
+    Correct a signal for buffer and titrant blanks.
+    """
+
+    return y - buffer_signal - titrant_signal*(1 - concentrations), y_err
+
+
+def dilutionStep(y,y_err,concentrations):
+    """
+    Correct a signal for dilution.
+    """
+
+    return y/concentrations, y_err
+
+
+def blankStep(y,y_err,blank_signal):
+    """
+    Subtract a blank signal (None for no blank).
+    """
+
+    if blank_signal is None:
+        return y, y_err
+
+    return y - blank_signal, y_err
+
+
+def MMEStep(y,y_err,MME_corr):
+    """
+    Convert a signal and its error to mean molar ellipticity.
+    """
+
+    return y*MME_corr, y_err*MME_corr
+
+
+def normalizeStep(y,y_err,invert):
+    """
+    Normalize a signal from 0 to 1 (inverting it if invert is True) and
+    scale its error to match.
+    """
+
+    maximum = y.max()
+    minimum = y.min()
+    norm_signal = (y - minimum)/(maximum - minimum)
+
+    if invert:
+        maximum = norm_signal.max()
+        norm_signal = -norm_signal + maximum
+
+    return norm_signal, y_err*norm_signal/y
+
+
+# Steps that work point by point, so that a run of them can be fused
+POINTWISE_STEPS = [darkQCStep,titrantBlankStep,dilutionStep,blankStep,MMEStep]
+
+# Number of points pushed through a fused run of steps at a time; small
+# enough that the intermediates of a block stay in the cache
+BLOCK_SIZE = 4096
+
+def blockOf(value,block):
+    """
+    Return the part of an array argument that falls in block (a slice).
+    Scalars (and None) apply to every block.
+    """
+
+    if numpy.ndim(value) == 0:
+        return value
+
+    return value[block]
+
+
+def fuseSteps(y,y_err,steps,block_size=BLOCK_SIZE,times=None):
+    """
+    Apply a sequence of pointwise (step, arguments) to a signal and its
+    error, pushing block_size points at a time through all of the steps.
+    The intermediates of a block never leave the cache, so the arrays are
+    read and written once rather than once per step.  The arithmetic is done
+    in the same order as applying the steps one after the other, so the
+    result is identical.  If times (a list with an entry per step) is given,
+    the seconds spent in each step are added to it.
+    """
+
+    new_y = numpy.empty(len(y))
+    new_err = None
+    for start in range(0,len(y),block_size):
+        block = slice(start,start + block_size)
+
+        block_y = y[block]
+        block_err = blockOf(y_err,block)
+        for i, (step, arguments) in enumerate(steps):
+            if times != None:
+                t0 = time.time()
+            block_y, block_err = step(block_y,block_err,
+                                      *[blockOf(a,block) for a in arguments])
+            if times != None:
+                times[i] += time.time() - t0
+
+        new_y[block] = block_y
+
+        # A scalar error stays a scalar (the steps only scale it)
+        if numpy.ndim(block_err) == 0:
+            new_err = block_err
+        else:
+            if new_err is None:
+                new_err = numpy.empty(len(y))
+            new_err[block] = block_err
+
+    return new_y, new_err
+
+
+class Channel(object):
     """
     Class to process a single output channel from an experiment.  Whenever a 
     method is called to process the signal, it writes over self.y and possibly
-    self.y_err.  It also saves a copy of the signal after processing as an 
-    attribute (listed in the method doc string).  All methods return a string
+    self.y_err.  It also saves the signal after processing as an attribute
+    (listed in the method doc string).  All methods return a string
     describing what occured that can be placed in the output file header.
+
+    Signals are held as float arrays.  Each step creates one new array and
+    the attribute it saves is that same array (not a copy).  Arrays are
+    shared rather than copied, so they must not be changed in place.
+    Neutral values for optional arguments are stored as scalars, which
+    broadcast against the signal; use column() to get any attribute as a
+    full length array.
+
+    The signals saved by the steps form a history.  Only the ones named in
+    keep() (usually the output columns) are held on to; the rest are dropped
+    as soon as nothing else refers to them and are recomputed from the raw
+    signal by replaying the steps if they are asked for later.
+
+    After deferSteps(), steps are queued rather than applied, and runSteps()
+    applies them, fusing runs of pointwise steps into a single pass (see
+    fuseSteps).
     """
 
+    __slots__ = ["name","x","y","y_err","concentrations","dark_signal",
+                 "qc_signal","shot_size","raw_x","raw_signal","raw_err",
+                 "denat_corr_x","steps","history","keep_names","pending"]
+
     def __init__(self,name,x,y,y_err=None,concentrations=None,dark_signal=None,
                  qc_signal=None,shot_size=None):
         """
-        Initialize instance of class. 
+        Initialize instance of class.  Arrays that are passed in are used
+        as they are (not copied), so they should not be changed afterwards.
 
         Creates self.raw_x, self.raw_signal, self.raw_err
         """
 
         self.name = name
-        self.x = x[:]
-        self.y = y[:]
+        self.x = numpy.asarray(x,dtype=float)
+        self.y = numpy.asarray(y,dtype=float)
 
         if len(self.x) == 0 or len(self.y) == 0:
             err = "No x or y values recorded for channel %s\n" % self.name
             raise AvivError(err)
 
-        # If optional arguments are not specified, create sane "neutral"
+        # If optional arguments are not specified, use sane "neutral"
         # defaults that will not alter the signal if they are used in a 
         # processing step.   
-        if y_err == None:
-            self.y_err = [0. for s in self.y]
-        else:
-            self.y_err = y_err[:]
-        
-        if concentrations == None:
-            self.concentrations = [1. for s in self.y]
-        else:
-            self.concentrations = concentrations[:] 
- 
-        if dark_signal == None:
-            self.dark_signal = [0. for s in self.y]
-        else:
-            self.dark_signal = dark_signal[:]
+        self.y_err = self.optionalArray(y_err,0.)
+        self.concentrations = self.optionalArray(concentrations,1.)
+        self.dark_signal = self.optionalArray(dark_signal,0.)
+        self.qc_signal = self.optionalArray(qc_signal,1.)
+        self.shot_size = self.optionalArray(shot_size,0.)
 
-        if qc_signal == None:
-            self.qc_signal = [1. for s in self.y]
-        else:
-            self.qc_signal = qc_signal[:]
+        # Record raw signals
+        self.raw_x = self.x
+        self.raw_signal = self.y
+        self.raw_err = self.y_err
+
+        # Processing steps applied so far and the signals they saved
+        self.steps = []
+        self.history = {}
+        self.keep_names = set()
+        self.pending = None
+
+    def __getattr__(self,name):
+        """
+        Look up signals saved by the processing steps (e.g. self.MME).
+        """
+
+        if name in self.__slots__:
+            raise AttributeError(name)
+
+        return self.intermediate(name)
 
-        if shot_size == None:
-            self.shot_size = [0. for s in self.y]
+    def keep(self,names):
+        """
+        Hold on to the signals in names as the steps that create them are
+        run, rather than recomputing them if they are asked for later.
+        """
+
+        self.keep_names = set(names)
+
+    def applyStep(self,names,step,*arguments):
+        """
+        Apply a processing step to self.y and self.y_err and record it in the
+        history.  step is a function taking the signal, the error and
+        arguments that returns the new signal and error; names gives the
+        names to save them under (None to not save one).  If steps are being
+        deferred, the step is queued instead.
+        """
+
+        if self.pending != None:
+            self.pending.append((names,step,arguments))
+            return
+
+        self.y, self.y_err = step(self.y,self.y_err,*arguments)
+        self.recordStep(names,step,arguments,(self.y,self.y_err))
+
+    def recordStep(self,names,step,arguments,values):
+        """
+        Record a step that has been applied in the history.  values holds
+        the signal and error it produced, or None if they were never
+        materialized.
+        """
+
+        self.steps.append((step,arguments))
+
+        for position, name in enumerate(names):
+            if name == None:
+                continue
+
+            if values == None:
+                value = None
+            else:
+                value = values[position]
+                if isinstance(value,numpy.ndarray) and \
+                   name not in self.keep_names:
+                    value = weakref.ref(value)
+
+            self.history[name] = (len(self.steps),position,value)
+
+    def deferSteps(self):
+        """
+        Queue processing steps as they are called, rather than applying them,
+        until runSteps is called.
+        """
+
+        self.pending = []
+
+    def runSteps(self,fused=True,times=None):
+        """
+        Apply the queued steps.  If fused is True, each run of pointwise steps
+        is applied in a single pass with fuseSteps; a run ends at any step
+        whose signals are kept.  If fused is False, the steps are applied one
+        after the other (the reference the fused path must match).  If times
+        (a list with an entry per queued step) is given, the seconds spent
+        applying each step are added to it.
+        """
+
+        pending = self.pending
+        self.pending = None
+
+        if times == None:
+            step_times = [0.0 for p in pending]
         else:
-            self.shot_size = shot_size[:]
+            step_times = times
+
+        run = []
+        for i, (names, step, arguments) in enumerate(pending):
+            if not fused or step not in POINTWISE_STEPS:
+                t0 = time.time()
+                self.applyStep(names,step,*arguments)
+                step_times[i] += time.time() - t0
+                continue
+
+            run.append((i,names,step,arguments))
+
+            # Finish the run if this is its last step or its signals are
+            # needed later
+            try:
+                last = pending[i + 1][1] not in POINTWISE_STEPS
+            except IndexError:
+                last = True
+            if not last and len(self.keep_names.intersection(names)) == 0:
+                continue
+
+            run_times = [0.0 for r in run]
+            self.y, self.y_err = fuseSteps(self.y,self.y_err,
+                                           [(r[2],r[3]) for r in run],
+                                           times=run_times)
+            for j, (index, names, step, arguments) in enumerate(run):
+                step_times[index] += run_times[j]
+                if j < len(run) - 1:
+                    self.recordStep(names,step,arguments,None)
+                else:
+                    self.recordStep(names,step,arguments,(self.y,self.y_err))
+            run = []
+
+    def intermediate(self,name):
+        """
+        Return a signal saved by a processing step, recomputing it from the
+        raw signal if it has been dropped.
+        """
 
-        # Record raw signals
-        self.raw_x = self.x[:]
-        self.raw_signal = self.y[:]
-        self.raw_err = self.y_err[:]
+        try:
+            num_steps, position, value = self.history[name]
+        except KeyError:
+            raise AttributeError(name)
+
+        if isinstance(value,weakref.ref):
+            value = value()
+
+        if value is None:
+            y, y_err = self.raw_signal, self.raw_err
+            for step, arguments in self.steps[:num_steps]:
+                y, y_err = step(y,y_err,*arguments)
+            value = (y,y_err)[position]
+
+        return value
+
+    def optionalArray(self,values,neutral):
+        """
+        Return values as a float array, or the neutral scalar if values is
+        None.
+        """
+
+        if values is None:
+            return neutral
+
+        return numpy.asarray(values,dtype=float)
+
+    def column(self,name):
+        """
+        Return an attribute as an array with one value per point, expanding
+        scalar neutral values.
+        """
+
+        return numpy.broadcast_to(getattr(self,name),self.raw_signal.shape)
 
     def correctDarkQC(self):
         """
@@ -101,9 +529,8 @@ class Channel:
         Creates self.qc_corr
         """
 
-        self.qc_corr = [(s - self.dark_signal[i])/self.qc_signal[i]
-                        for i, s in enumerate(self.y)]
-        self.y = self.qc_corr[:]
+        self.applyStep(("qc_corr",None),darkQCStep,self.dark_signal,
+                       self.qc_signal)
         
         return "Corrected with QC and dark signals\n"
  
@@ -118,11 +545,8 @@ class Channel:
         # Do buffer correction
         buffer_signal = buf_blank
         titrant_signal = titr_blank - buffer_signal
-        corr_signal = [s-buffer_signal-titrant_signal*(1-self.concentrations[i])
-                       for i, s in enumerate(self.y)]
-
-        self.corr_signal = corr_signal[:]
-        self.y = self.corr_signal[:]
+        self.applyStep(("corr_signal",None),titrantBlankStep,buffer_signal,
+                       titrant_signal,self.concentrations)
 
         # Create output 
         out = ["Titrant Blank Correction:\n"]
@@ -138,9 +562,8 @@ class Channel:
         Creates self.dilution_corr_signal.
         """
 
-        self.dilution_corr_signal = [y/self.concentrations[i]
-                                     for i, y in enumerate(self.y)]
-        self.y = self.dilution_corr_signal[:]
+        self.applyStep(("dilution_corr_signal",None),dilutionStep,
+                       self.concentrations)
 
         return "Corrected signal for dilution\n"
 
@@ -161,7 +584,7 @@ class Channel:
         # Make sure that the values specified will actually do a denaturant
         # correction
         if input_values == instrument_values or input_values == 3*[None]:
-            self.denat_corr_x = self.x[:]
+            self.denat_corr_x = self.x
             return ""
 
         # Decide whether to use values from self or argument list
@@ -174,19 +597,15 @@ class Channel:
 
         # Perform correction
         try:
-            titrant = [init_conc]
-            shot_size = [s/1000 for s in self.shot_size]
-            for i in range(1,len(self.shot_size)):
-                titr = titrant[i-1]*(cell_vol - shot_size[i])/cell_vol
-                titr = titr + shot_size[i]*titrant_conc/cell_vol
-                titrant.append(titr)
-        except ValueError:
+            titrant = titrantConcentrations(self.column("shot_size"),
+                                            init_conc,titrant_conc,cell_vol)
+        except (ValueError,TypeError):
             err = "Invalid denaturant correction value specified!\n"
-            raise AvivModuleError(err) 
+            raise AvivError(err) 
 
         # Update with new titrant concentrations
-        self.x = titrant[:]
-        self.denat_corr_x = titrant[:]
+        self.x = titrant
+        self.denat_corr_x = self.x
 
         # Create logfile output
         out = ["Denaturant Correction:\n"]
@@ -202,26 +621,27 @@ class Channel:
 
     def subtractBlank(self,blank_file=None):
         """
-        Subtract the blank signal from a channel.
+        Subtract the blank signal from a channel.  blank_file may also be a
+        list of blank files, whose signals are averaged.  Blanks are read
+        once and then taken from the cache in blanks.py.
 
         Creates self.blanked.
         """
 
         if blank_file != None:
-            blank_exp = parsers.preParse(blank_file)
+            blank = blanks.getBlank(blank_file)
         else:
-            self.blanked = self.y[:]
+            self.applyStep(("blanked",None),blankStep,None)
             return "No blank correction done!\n" 
 
-        if self.x != blank_exp.channel_list[0].raw_x:
+        if not numpy.array_equal(self.x,blank.x):
             err = "Blank file and input file do not match!"
             raise AvivError(err)
 
-        tmp_x = [s - blank_exp.channel_list[0].raw_signal[i]
-                 for i, s in enumerate(self.y)]
-        self.blanked = tmp_x[:]
+        self.applyStep(("blanked",None),blankStep,blank.signal)
 
-        self.y = self.blanked[:]   
+        if not isinstance(blank_file,basestring):
+            blank_file = "\", \"".join(blank_file)
     
         return "Removed blank (\"%s\")\n" % blank_file
 
@@ -239,12 +659,7 @@ class Channel:
         MME_corr = (100.0*molec_weight)/(path_length*initial_conc*num_residues)
 
         # Convert signal and error to MME
-        len_data = len(self.y)
-        self.MME = [self.y[i]*MME_corr for i in range(len_data)]
-        self.MME_err = [self.y_err[i]*MME_corr for i in range(len_data)]
-        
-        self.y = self.MME[:]
-        self.y_err = self.MME_err[:]       
+        self.applyStep(("MME","MME_err"),MMEStep,MME_corr)
 
         # Write out data file processing data
         out = ["MME converstion:\n"]
@@ -262,24 +677,46 @@ class Channel:
         Creates self.norm_signal, self.norm_err.
         """
 
-        # Normalize the signal
-        maximum = max(self.y)
-        minimum = min(self.y)
-        self.norm_signal = [(s-minimum)/(maximum-minimum) for s in self.y]
+        self.applyStep(("norm_signal","norm_err"),normalizeStep,invert)
 
-        # Invert the signal if required
-        if invert:
-            maximum = max(self.norm_signal)
-            self.norm_signal = [-s + maximum for s in self.norm_signal]
+        return ""
 
-        # Generate normalized error
-        self.norm_err = [self.y_err[i]*self.norm_signal[i]/self.y[i]
-                         for i in range(len(self.y))]
-        
-        self.y = self.norm_signal[:]
-        self.y_err = self.norm_err[:]
+# Number of rows formatted and written at a time by writeColumns
+ROWS_PER_WRITE = 256
+
+def writeColumns(f,titles,columns,column_width=12):
+    """
+    Write columns of numbers to f (anything with a write method) as
+    R-readable text: a row of titles, then a row for each point with its
+    index and the value from each column.  Rows are formatted with a single,
+    precompiled template and written ROWS_PER_WRITE at a time, so only that
+    many rows of text are ever held in memory.
+    """
+
+    f.write("".join([("%%%is" % column_width) % t
+                     for t in [" "] + list(titles)]) + "\n")
+
+    row = "%%%ii" % column_width
+    row += ("%%%i.3F" % column_width)*len(columns) + "\n"
+
+    num_rows = len(columns[0])
+    for start in range(0,num_rows,ROWS_PER_WRITE):
+        stop = min(start + ROWS_PER_WRITE,num_rows)
+        data = numpy.column_stack([c[start:stop] for c in columns]).tolist()
+        f.write("".join([row % tuple([start + i] + values)
+                         for i, values in enumerate(data)]))
+
+
+def formatColumns(titles,columns,column_width=12):
+    """
+    Return the text writeColumns would write.
+    """
+
+    f = cStringIO.StringIO()
+    writeColumns(f,titles,columns,column_width)
+
+    return f.getvalue()
 
-        return ""
 
 class Parser:
     """
@@ -289,6 +726,15 @@ class Parser:
     daughter class in question.
     """
 
+    # Whether processFile fuses the pointwise processing steps of each
+    # channel (False applies them one at a time)
+    fuse_steps = True
+
+    # Number of header lines in the "Experiment information" block written
+    # by createConfigHeader.  A header passed to writeOutput replaces the
+    # blank line that follows them.
+    experiment_info_lines = 4
+
     def __init__(self,**kwargs):
         """
         Initialize instance of class.  The kwarg values will depend on the
@@ -297,6 +743,7 @@ class Parser:
 
         self.config_extract = []
         self.data_extract = {}
+        self.header_lines = None
         
         # Experiment-specific data that may or may not be extracted; put a 
         # dummy here in case it is used.
@@ -314,36 +761,167 @@ class Parser:
             self.instrument_kwargs = []
 
   
-    def processFile(self,**kwargs):
+    def extractFile(self,raw=None,**kwargs):
+        """
+        Read the file (or take its contents from raw, a RawExperiment made by
+        an earlier parse of the same file) and populate channel_list, without
+        doing any of the processing that depends on user input.
+        """
         
         if "input_file" not in kwargs.keys():
             err = "input_file key must be specified!\n"
             raise AvivError(err)
   
         # Initialize data to be extracted
+        self.config_extract = []
+        self.data_extract = {}
         self.setupInstrumentExtraction(**kwargs)
         self.setupExperimentExtraction(**kwargs)
 
         # Load in experiment, extracting data
-        header = []
-        self.loadExperiment(kwargs["input_file"])
-        header.append(self.createConfigHeader())
-        # Process each channel
+        self.loadExperiment(kwargs["input_file"],raw)
+        self.config_header = self.createConfigHeader()
+
+        # Create the channels, which only need to hold on to the processed
+        # signals that are written out
         self.grabChannels()
-        header.append(self.processChannels(**kwargs))
+        output_columns = self.outputColumns()[0]
+        for c in self.channel_list:
+            c.keep(output_columns)
 
-        data_out = self.createOutput()
+    def processFile(self,raw=None,**kwargs):
+        """
+        Extract and process the file, creating the final output.  If raw is
+        given, the file is not read again.
+        """
 
+        self.extractFile(raw,**kwargs)
+
+        # Process each channel
+        header = [self.config_header]
+        header.append(self.processChannels(**kwargs))
+
+        # The data are only formatted when the output is written
         header = "".join(header)
-        header = header.split("\n")
-        header = "".join(["# %s\n" % l for l in header])
+        self.header_lines = ["# %s\n" % l for l in header.split("\n")]
+
+    def startLive(self,config_file=None,**kwargs):
+        """
+        Follow a file that is still being written by the instrument, taking
+        the same kwargs as processFile.  Call refresh to pick up new data.
+        Until the file has its own configuration section, the configuration
+        of config_file is used; without one, only the channels are updated.
+        """
+
+        if "input_file" not in kwargs.keys():
+            err = "input_file key must be specified!\n"
+            raise AvivError(err)
+
+        self.live_kwargs = kwargs
+
+        # Record the instrument and experiment type of this class
+        self.setupInstrumentExtraction(**kwargs)
+        self.setupExperimentExtraction(**kwargs)
+
+        self.openLive(kwargs["input_file"],config_file)
+
+        return self.refresh()
+
+    def refresh(self):
+        """
+        Parse only the data added to the live file since the last refresh (see
+        startLive) and, if there are any, update the channels and the output.
+        Returns True if anything changed.
+        """
+
+        if not self.readTail():
+            return False
+
+        # Without a configuration, the channels can be updated but not
+        # processed
+        if len(self.raw.config_lines) == 0:
+            self.config_extract = []
+            self.data_extract = {}
+            self.setupInstrumentExtraction(**self.live_kwargs)
+            self.setupExperimentExtraction(**self.live_kwargs)
+            self.useRaw(self.raw)
+            self.extractData()
+            self.grabChannels()
+            self.header_lines = None
+        else:
+            self.processFile(self.raw,**self.live_kwargs)
+
+        return True
 
-        self.out = "".join([header,data_out])
+    def processChannels(self,**kwargs):
+        """
+        Process each channel with the stages in the pipeline of the
+        experiment, returning the log for the output file header.
+        """
+
+        return stages.runPipeline(self,self.pipeline,kwargs,self.fuse_steps)
+
+    def outputData(self):
+        """
+        Return the titles and the arrays of the R-readable output columns
+        that can then be used for fitting or plotting: the columns given by
+        the outputColumns method of the experiment for each channel.
+        """
+
+        to_write, header = self.outputColumns()
+
+        titles = []
+        if self.grab_sample:
+            titles.extend(["s_%s" % c for c in header])
+        if self.grab_reference:
+            titles.extend(["r_%s" % c for c in header])
+
+        columns = [c.column(w) for c in self.channel_list for w in to_write]
+
+        return titles, columns
+
+    def createOutput(self,column_width=12):
+        """
+        Create R-readable output that can then be used for fitting or
+        plotting.
+        """
+
+        titles, columns = self.outputData()
+
+        return formatColumns(titles,columns,column_width)
+
+    def writeOutput(self,f,extra_header=None,column_width=12):
+        """
+        Write pretty output to f (an open file, sys.stdout or anything else
+        with a write method) as it is generated: the header a line at a time,
+        then the data a few rows at a time.  extra_header (text with each
+        line starting with "#") is inserted after the experiment information
+        at the top of the header.
+        """
+
+        lines = self.header_lines
+        if extra_header == None:
+            f.writelines(lines)
+        else:
+            f.writelines(lines[:self.experiment_info_lines])
+            f.write(extra_header)
+            f.writelines(lines[self.experiment_info_lines + 1:])
+
+        titles, columns = self.outputData()
+        writeColumns(f,titles,columns,column_width)
 
     def finalOutput(self):
         """
-        Return pretty output.
+        Return pretty output as a single string (None if the file has not
+        been processed).  Use writeOutput to write it out without building
+        the string.
         """
-        
-        return self.out
+
+        if self.header_lines == None:
+            return None
+
+        f = cStringIO.StringIO()
+        self.writeOutput(f)
+
+        return f.getvalue()
         
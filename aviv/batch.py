@@ -0,0 +1,364 @@
+__description__ = \
+"""
+Headless processing of Aviv files.  A job spec (a JSON file) lists the input
+files and the keyword arguments to pass to the parser for each:
+
+    {
+        "output_dir": "processed",
+        "defaults": {"protein_conc": 50.0, "sam_buf": 0.1, "sam_titr": 0.3},
+        "instrument_defaults": {
+            "CD":  {"num_residues": 143, "molec_weight": 16116.0,
+                    "path_length": 1.0},
+            "ATF": {"sample": true, "reference": true}
+        },
+        "jobs": [
+            "101504bc.dat",
+            {"input_file": "060620_basedenat.dat.gz", "qc_corr": false,
+             "output_file": "base.txt"}
+        ]
+    }
+
+Each file is identified from its header and processed by the matching class
+in parsers.available_parsers.  The kwargs for a file are the "defaults",
+updated by the "instrument_defaults" for its instrument, updated by the
+entries of its job.  Relative paths (including the kwargs in PATH_KEYS) are
+taken relative to the job spec.  If an ATF job does not say otherwise,
+qc_corr is taken from the file's summary and the reference channel is
+processed if the file has one.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, json
+from errors import AvivError
+
+# Added to the name of an input file (less its extensions) to name its output
+OUTPUT_SUFFIX = "_processed.dat"
+
+# Extensions removed from input files when naming their output
+INPUT_EXTENSIONS = [".gz",".bz2",".xz",".dat"]
+
+# Entries of a job that are not passed to the parser
+JOB_KEYS = ["input_file","output_file"]
+
+# kwargs that name files or directories (a single path or a list of them)
+PATH_KEYS = ["blank_file","blank_dir"]
+
+class Job:
+    """
+    A single file to process: its name, the kwargs given for it (not
+    including input_file), the file to write the output to (or None to name
+    it after the input file) and the defaults of its spec.  The kwargs of
+    the job are kept apart from the defaults so that the instrument defaults
+    can be applied between the two (see jobKwargs).
+    """
+
+    def __init__(self,input_file,kwargs,output_file=None,defaults={}):
+        """
+        Initialize instance of class.
+        """
+
+        self.input_file = input_file
+        self.kwargs = kwargs
+        self.output_file = output_file
+        self.defaults = defaults
+
+
+class JobResult:
+    """
+    Compact, picklable record of what happened to a Job: the input file, the
+    instrument and experiment type found in it, the output file written
+    (None if the job failed), the error message (None if it succeeded) and
+    the time spent in each processing stage (see stages.stageProfile).
+    """
+
+    def __init__(self,input_file,instrument=None,exp_type=None,
+                 output_file=None,error=None,profile=None):
+        """
+        Initialize instance of class.
+        """
+
+        self.input_file = input_file
+        self.instrument = instrument
+        self.exp_type = exp_type
+        self.output_file = output_file
+        self.error = error
+
+        if profile == None:
+            profile = {}
+        self.profile = profile
+
+
+def stringKeys(dictionary):
+    """
+    Return a copy of a dictionary read from JSON with (unicode) keys turned
+    into strings, so that it can be passed as **kwargs.
+    """
+
+    return dict([(str(k),v) for k, v in dictionary.items()])
+
+
+def readJobSpec(spec_file,input_files=[]):
+    """
+    Read a JSON job spec.  Returns a list of Job instances, along with the
+    defaults, output directory and per-instrument defaults of the spec.  Jobs
+    for any input_files given are added using the defaults of the spec.
+    """
+
+    try:
+        f = open(spec_file,'r')
+        try:
+            spec = json.load(f)
+        finally:
+            f.close()
+    except (IOError,ValueError), value:
+        err = "Could not read job spec \"%s\": %s" % (spec_file,value)
+        raise AvivError(err)
+
+    spec_dir = os.path.dirname(os.path.abspath(spec_file))
+    def specPath(path):
+        return os.path.join(spec_dir,os.path.expanduser(path))
+
+    def specKwargs(kwargs):
+        kwargs = stringKeys(kwargs)
+        for k in PATH_KEYS:
+            if kwargs.get(k) == None:
+                continue
+            if isinstance(kwargs[k],basestring):
+                kwargs[k] = specPath(kwargs[k])
+            else:
+                kwargs[k] = [specPath(path) for path in kwargs[k]]
+        return kwargs
+
+    try:
+        output_dir = spec.get("output_dir")
+        if output_dir != None:
+            output_dir = specPath(output_dir)
+        defaults = specKwargs(spec.get("defaults",{}))
+        instrument_defaults = spec.get("instrument_defaults",{})
+        instrument_defaults = dict([(str(k),specKwargs(v)) for k, v in
+                                    instrument_defaults.items()])
+
+        jobs = []
+        for entry in list(spec.get("jobs",[])) + list(input_files):
+            if isinstance(entry,basestring):
+                entry = {"input_file":entry}
+
+            kwargs = specKwargs(dict([(k,v) for k, v in entry.items()
+                                      if k not in JOB_KEYS]))
+
+            output_file = entry.get("output_file")
+            if output_file != None:
+                output_file = specPath(output_file)
+
+            jobs.append(Job(specPath(entry["input_file"]),kwargs,output_file,
+                            defaults))
+
+    except (AttributeError,KeyError,TypeError), value:
+        err = "Job spec \"%s\" is not valid: %s" % (spec_file,value)
+        raise AvivError(err)
+
+    return jobs, defaults, output_dir, instrument_defaults
+
+
+def jobKwargs(input_file,kwargs,instrument_defaults={},defaults={}):
+    """
+    Identify an input file and return its (instrument,exp_type), parser
+    class and the complete set of kwargs to process it with: defaults,
+    updated by the instrument_defaults for its instrument, updated by kwargs
+    (see the module description).
+    """
+
+    # The parsers (and numpy) are only imported once a file is processed, so
+    # that reading job specs is fast
+    import parsers, instruments
+
+    unknown = instruments.Unknown(input_file)
+    exp_id = unknown.identifyExperiment()
+    try:
+        parser_class = parsers.available_parsers[exp_id]
+    except KeyError:
+        err = "%s %s experiments (\"%s\") can't be processed!" % \
+            (exp_id[0],exp_id[1],input_file)
+        raise AvivError(err)
+
+    job_kwargs = dict(defaults)
+    job_kwargs.update(instrument_defaults.get(unknown.instrument,{}))
+    job_kwargs.update(kwargs)
+    job_kwargs["input_file"] = input_file
+
+    # Take ATF defaults from how the experiment was collected
+    if unknown.instrument == "ATF":
+        if "qc_corr" not in job_kwargs:
+            job_kwargs["qc_corr"] = \
+                unknown.summary.flag("QC Correction",False)
+        if "sample" not in job_kwargs and "reference" not in job_kwargs:
+            job_kwargs["sample"] = True
+            if "Ref. Sig." in unknown.summary.data_sets:
+                job_kwargs["reference"] = True
+
+    return exp_id, parser_class, job_kwargs
+
+
+def outputName(input_file,output_dir=None):
+    """
+    Name the output file for an input file: the input file name, less any
+    compression and .dat extensions, plus OUTPUT_SUFFIX.  It is put in
+    output_dir if given, or next to the input file otherwise.
+    """
+
+    root = input_file
+    for extension in INPUT_EXTENSIONS:
+        if root.lower().endswith(extension):
+            root = root[:-len(extension)]
+
+    if output_dir != None:
+        root = os.path.join(output_dir,os.path.basename(root))
+
+    return "%s%s" % (root,OUTPUT_SUFFIX)
+
+
+def writeOutput(output_file,output):
+    """
+    Write output to output_file, creating its directory if necessary.  output
+    is either text or a processed parser, whose output is written as it is
+    generated (see Parser.writeOutput).
+    """
+
+    # Another worker process may create the directory at the same time
+    output_path = os.path.dirname(output_file)
+    if output_path != "" and not os.path.isdir(output_path):
+        try:
+            os.makedirs(output_path)
+        except OSError:
+            if not os.path.isdir(output_path):
+                raise
+
+    f = open(output_file,'w')
+    try:
+        if isinstance(output,basestring):
+            f.write(output)
+        else:
+            output.writeOutput(f)
+    finally:
+        f.close()
+
+
+def processJob(job,output_dir=None,instrument_defaults={}):
+    """
+    Process a single Job and write its output.  Returns a JobResult; errors
+    reading or processing the file are recorded in it rather than raised, as
+    are unexpected exceptions (with the name of the exception), so that one
+    bad file does not stop the jobs around it.
+    """
+
+    # stages imports numpy, which reading job specs does without
+    import stages
+
+    start_profile = stages.stageProfile()
+
+    result = JobResult(job.input_file)
+    try:
+        exp_id, parser_class, kwargs = jobKwargs(job.input_file,job.kwargs,
+                                                 instrument_defaults,
+                                                 job.defaults)
+        result.instrument, result.exp_type = exp_id
+
+        parser = parser_class()
+        parser.processFile(**kwargs)
+
+        output_file = job.output_file
+        if output_file == None:
+            output_file = outputName(job.input_file,output_dir)
+
+        writeOutput(output_file,parser)
+        result.output_file = output_file
+
+    except (AvivError,IOError,OSError), value:
+        result.error = str(value).strip()
+    except Exception, value:
+        result.error = unexpectedError(value)
+
+    result.profile = stages.profileSince(start_profile)
+
+    return result
+
+
+def unexpectedError(value):
+    """
+    Describe an exception that processing a file was not expected to raise.
+    """
+
+    return "%s: %s" % (value.__class__.__name__,str(value).strip())
+
+
+def mergeProfiles(profiles):
+    """
+    Add up stage profiles (dictionaries of stage names to (number of runs,
+    seconds)), e.g. those of the JobResults of a batch.
+    """
+
+    merged = {}
+    for profile in profiles:
+        for name, (runs, seconds) in profile.items():
+            merged_runs, merged_seconds = merged.get(name,(0,0.0))
+            merged[name] = (merged_runs + runs,merged_seconds + seconds)
+
+    return merged
+
+
+def _processJob(arguments):
+    """
+    Run processJob in a worker process, returning the index of the job with
+    its result.  (Pool.imap_unordered passes one argument.)
+    """
+
+    index = arguments[0]
+
+    return index, processJob(*arguments[1:])
+
+
+def processJobs(jobs,output_dir=None,instrument_defaults={},processes=1,
+                progress=None):
+    """
+    Process a list of Job instances, returning a JobResult for each in the
+    same order.  A job that fails does not stop the others.  If processes is
+    more than 1 (or None, for one per CPU), the jobs are spread across that
+    many worker processes.  If given, progress(number done, number of jobs,
+    result) is called as each job finishes, which need not be in the order
+    of jobs.  The stage profiles of the results can be added up with
+    mergeProfiles, wherever the jobs were run.
+    """
+
+    import multiprocessing
+
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes,len(jobs))
+
+    arguments = [(i,job,output_dir,instrument_defaults)
+                 for i, job in enumerate(jobs)]
+
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        job_results = pool.imap_unordered(_processJob,arguments)
+    else:
+        job_results = (_processJob(a) for a in arguments)
+
+    results = [None for job in jobs]
+    try:
+        for num_done, (index, result) in enumerate(job_results):
+            results[index] = result
+            if progress != None:
+                progress(num_done + 1,len(jobs),result)
+    except:
+        if pool != None:
+            pool.terminate()
+        raise
+
+    if pool != None:
+        pool.close()
+        pool.join()
+
+    return results
@@ -0,0 +1,362 @@
+__description__ = \
+"""
+Process-wide cache of the blank scans subtracted by Channel.subtractBlank.
+One blank scan is often subtracted from dozens of samples, so each blank is
+read once and only its raw x and raw signal arrays are kept.  Entries are
+keyed on the blank file (or files) and invalidated when the size or
+modification time of a file changes; the least recently used blanks are
+dropped when there are more than max_entries.  Several blank files can be
+averaged into a single blank.
+
+A BlankLibrary indexes a directory of blank scans by how they were collected
+so that the blank for a sample can be found automatically (see findBlank).
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, time, threading
+import numpy
+from errors import AvivError
+
+# Number of blanks kept by the default cache
+MAX_BLANKS = 32
+
+class Blank:
+    """
+    x and signal arrays of a blank (averaged over blank_files if there is
+    more than one).  The arrays are shared by every channel the blank is
+    subtracted from and must not be changed.
+    """
+
+    def __init__(self,blank_files,x,signal):
+        """
+        Initialize instance of class.
+        """
+
+        self.blank_files = blank_files
+        self.x = x
+        self.signal = signal
+
+
+class BlankCache:
+    """
+    Cache of Blank instances held in memory.
+    """
+
+    def __init__(self,max_entries=MAX_BLANKS):
+        """
+        Initialize instance of class.
+        """
+
+        self.max_entries = max_entries
+        self.entries = {}
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def fileSignature(self,blank_file):
+        """
+        Return the values used to decide whether an entry is still valid.
+        """
+
+        try:
+            stat = os.stat(blank_file)
+        except OSError, value:
+            err = "Could not read blank file \"%s\": %s" % (blank_file,value)
+            raise AvivError(err)
+
+        return (stat.st_size,stat.st_mtime)
+
+    def readBlank(self,blank_files):
+        """
+        Read the first channel of each blank file, averaging their signals.
+        The arrays kept are copies, so that a cached blank does not hold on
+        to the rest of the data of its file.
+        """
+
+        # parsers imports base, which imports this module
+        import parsers
+
+        x = None
+        signals = []
+        for blank_file in blank_files:
+            channel = parsers.preParse(blank_file).channel_list[0]
+
+            if x is None:
+                x = numpy.array(channel.raw_x)
+            elif not numpy.array_equal(x,channel.raw_x):
+                err = "Blank files \"%s\" and \"%s\" do not match!" % \
+                    (blank_files[0],blank_file)
+                raise AvivError(err)
+
+            signals.append(channel.raw_signal)
+
+        if len(signals) == 1:
+            signal = numpy.array(signals[0])
+        else:
+            signal = numpy.mean(numpy.vstack(signals),axis=0)
+
+        return Blank(blank_files,x,signal)
+
+    def get(self,blank_files):
+        """
+        Return the Blank for a blank file, or for a list of blank files to be
+        averaged, reading them if they are not cached.
+        """
+
+        if isinstance(blank_files,basestring):
+            blank_files = [blank_files]
+        blank_files = list(blank_files)
+        if len(blank_files) == 0:
+            err = "No blank files given!"
+            raise AvivError(err)
+
+        key = tuple([os.path.abspath(f) for f in blank_files])
+        signature = tuple([self.fileSignature(f) for f in blank_files])
+
+        self.lock.acquire()
+        try:
+            self.counter += 1
+            try:
+                entry_signature, blank, last_used = self.entries[key]
+                if entry_signature == signature:
+                    self.entries[key] = (signature,blank,self.counter)
+                    return blank
+            except KeyError:
+                pass
+        finally:
+            self.lock.release()
+
+        # Read outside the lock so other threads are not held up
+        blank = self.readBlank(blank_files)
+
+        self.lock.acquire()
+        try:
+            self.counter += 1
+            self.entries[key] = (signature,blank,self.counter)
+
+            if len(self.entries) > self.max_entries:
+                by_use = [(v[2],k) for k, v in self.entries.items()]
+                by_use.sort()
+                for last_used, old_key in by_use[:-self.max_entries]:
+                    del self.entries[old_key]
+        finally:
+            self.lock.release()
+
+        return blank
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+
+        self.lock.acquire()
+        try:
+            self.entries = {}
+        finally:
+            self.lock.release()
+
+
+# The cache used by Channel.subtractBlank
+blank_cache = BlankCache()
+
+def getBlank(blank_files):
+    """
+    Return the Blank for a blank file (or list of blank files to average)
+    from the process-wide cache.
+    """
+
+    return blank_cache.get(blank_files)
+
+
+# Configuration values that must match between a sample and its blank.  The
+# first three give the wavelength grid of the scan.
+LIBRARY_KEYS = ["$WLSTART","$WLEND","$WLEVERY","$MONOBW","$TEMPSP"]
+
+# Seconds between checks of the files of a blank library for changes that
+# don't change the directory (i.e. files rewritten in place)
+RECHECK_INTERVAL = 10.0
+
+def acquisitionKey(experiment):
+    """
+    Return the values of LIBRARY_KEYS for an experiment (any instance of
+    instruments.Aviv that has read a file), with None for missing values.
+    """
+
+    key = []
+    for aviv_key in LIBRARY_KEYS:
+        try:
+            key.append(experiment.configValue(aviv_key,float))
+        except AvivError:
+            key.append(None)
+
+    return tuple(key)
+
+
+class BlankLibrary:
+    """
+    Index of the CD wavelength scans in a directory of blanks, by their
+    acquisition parameters (see LIBRARY_KEYS), which include the wavelength
+    grid, so that the blank for a sample is found with a single dictionary
+    lookup.  Only the header and configuration of each scan are read to
+    index it; the data of a blank are read through the blank cache when it
+    is used.
+
+    A lookup only checks the modification time of the directory, which
+    changes when files are added, removed or renamed.  The size and
+    modification time of each file (to catch files rewritten in place) are
+    checked when the directory changes, every recheck_interval seconds and
+    on refresh(), and only new or changed files are read again.  Files that
+    can't be read (e.g. scans still being written) are left out of the index
+    until they change.
+    """
+
+    def __init__(self,blank_dir,recheck_interval=RECHECK_INTERVAL):
+        """
+        Initialize instance of class.
+        """
+
+        if not os.path.isdir(blank_dir):
+            err = "\"%s\" is not a directory!" % blank_dir
+            raise AvivError(err)
+
+        self.blank_dir = blank_dir
+        self.recheck_interval = recheck_interval
+        self.dir_mtime = None
+        self.check_time = None
+        self.file_names = []
+        self.files = {}
+        self.index = {}
+        self.lock = threading.Lock()
+
+    def readEntry(self,blank_file):
+        """
+        Return the index key of a blank file, or None if it is not a CD
+        wavelength scan or can't be read.
+        """
+
+        # instruments imports base, which imports this module
+        import instruments
+
+        # Anything can go wrong reading a file that is still being written
+        try:
+            unknown = instruments.Unknown(blank_file)
+            if unknown.identifyExperiment() != ("CD","Wavelength"):
+                return None
+            return acquisitionKey(unknown)
+        except Exception:
+            return None
+
+    def update(self,force=False):
+        """
+        Bring the index up to date with the directory.  The files themselves
+        are only checked if the directory has changed, if recheck_interval
+        has passed since they were last checked, or if force is True.
+        """
+
+        try:
+            dir_mtime = os.stat(self.blank_dir).st_mtime
+        except OSError, value:
+            err = "Could not read blank directory \"%s\": %s" % \
+                (self.blank_dir,value)
+            raise AvivError(err)
+
+        now = time.time()
+        if dir_mtime == self.dir_mtime and not force and \
+           now - self.check_time < self.recheck_interval:
+            return
+
+        if dir_mtime != self.dir_mtime:
+            self.file_names = [os.path.join(self.blank_dir,f)
+                               for f in os.listdir(self.blank_dir)]
+            self.dir_mtime = dir_mtime
+        self.check_time = now
+
+        files = {}
+        for blank_file in self.file_names:
+            if not os.path.isfile(blank_file):
+                continue
+
+            try:
+                signature = blank_cache.fileSignature(blank_file)
+            except AvivError:
+                continue
+
+            try:
+                old_signature, key = self.files[blank_file]
+                if old_signature == signature:
+                    files[blank_file] = (signature,key)
+                    continue
+            except KeyError:
+                pass
+
+            files[blank_file] = (signature,self.readEntry(blank_file))
+
+        index = {}
+        for blank_file in sorted(files.keys()):
+            key = files[blank_file][1]
+            if key != None:
+                index.setdefault(key,[]).append(blank_file)
+
+        self.files = files
+        self.index = index
+
+    def refresh(self):
+        """
+        Check every file in the directory for changes now.
+        """
+
+        self.lock.acquire()
+        try:
+            self.update(force=True)
+        finally:
+            self.lock.release()
+
+    def find(self,experiment):
+        """
+        Return the blank files that match an experiment (an instance of
+        instruments.Aviv that has read the sample), or None if there are
+        none.  The sample itself is never returned, even if it is in the
+        directory.  If several blanks match, all of them are returned.
+        """
+
+        sample = os.path.realpath(experiment.input_file)
+        key = acquisitionKey(experiment)
+
+        self.lock.acquire()
+        try:
+            self.update()
+            matches = [f for f in self.index.get(key,[])
+                       if os.path.realpath(f) != sample]
+        finally:
+            self.lock.release()
+
+        if len(matches) == 0:
+            return None
+
+        return matches
+
+
+# Blank libraries that have been used, by directory
+libraries = {}
+libraries_lock = threading.Lock()
+
+def findBlank(blank_dir,experiment):
+    """
+    Return the blank files in blank_dir that match an experiment (see
+    BlankLibrary.find).  The library of each directory is kept for the life
+    of the process.
+    """
+
+    key = os.path.abspath(blank_dir)
+
+    libraries_lock.acquire()
+    try:
+        try:
+            library = libraries[key]
+        except KeyError:
+            library = BlankLibrary(blank_dir)
+            libraries[key] = library
+    finally:
+        libraries_lock.release()
+
+    return library.find(experiment)
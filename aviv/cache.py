@@ -0,0 +1,342 @@
+__description__ = \
+"""
+Optional cache of parsed Aviv files.  The RawExperiment read from a file is
+stored in a cache directory (ParseCache) or in memory (MemoryCache) so that
+processing the same file again (with different blanks, protein
+concentrations, etc.) skips the text parsing.  The cache is off unless one is
+installed with setDefaultCache or the AVIV_CACHE_DIR environment variable is
+set.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, cPickle, hashlib, tempfile, threading
+import instruments
+from base import AvivError, RawExperiment
+
+# Bump this whenever the contents of RawExperiment change so that old entries
+# are ignored.
+CACHE_VERSION = 1
+
+# Environment variables used to turn on the default cache
+CACHE_DIR_VARIABLE = "AVIV_CACHE_DIR"
+CACHE_SIZE_VARIABLE = "AVIV_CACHE_SIZE"
+
+# RawExperiment attributes stored in each entry.  The block statistics are
+# cheap to recalculate, so they are not stored.
+RAW_FIELDS = ["instrument","exp_type","summary_lines","config_lines",
+              "section_offsets","columns","blocks","bad_cells"]
+
+class ParseCache:
+    """
+    Cache of RawExperiment instances stored in a directory, one compact
+    binary file per input file.  Entries are invalidated when the size or
+    modification time of the input file changes (or, if check_hash is True,
+    its contents).  The least recently used entries are removed when the
+    cache grows larger than max_size bytes.
+    """
+
+    def __init__(self,cache_dir,max_size=256*1024*1024,check_hash=False):
+        """
+        Initialize instance of class.
+        """
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.check_hash = check_hash
+
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                err = "Could not create cache directory \"%s\"!" % cache_dir
+                raise AvivError(err)
+
+    def entryFile(self,input_file):
+        """
+        Return the name of the cache entry for an input file.
+        """
+
+        key = hashlib.sha1(os.path.abspath(input_file)).hexdigest()
+        return os.path.join(self.cache_dir,"%s.raw" % key)
+
+    def fileSignature(self,input_file):
+        """
+        Return the values used to decide whether an entry is still valid.
+        """
+
+        stat = os.stat(input_file)
+        signature = {"path":os.path.abspath(input_file),
+                     "size":stat.st_size,
+                     "mtime":stat.st_mtime}
+
+        if self.check_hash:
+            f = open(input_file,'rb')
+            try:
+                signature["hash"] = hashlib.sha1(f.read()).hexdigest()
+            finally:
+                f.close()
+
+        return signature
+
+    def get(self,input_file):
+        """
+        Return the cached RawExperiment for input_file, or None if there is no
+        valid entry.
+        """
+
+        entry_file = self.entryFile(input_file)
+        if not os.path.isfile(entry_file):
+            return None
+
+        try:
+            f = open(entry_file,'rb')
+            try:
+                entry = cPickle.load(f)
+            finally:
+                f.close()
+        except Exception:
+            self.remove(entry_file)
+            return None
+
+        try:
+            if entry["version"] != CACHE_VERSION or \
+               entry["signature"] != self.fileSignature(input_file):
+                self.remove(entry_file)
+                return None
+            fields = dict([(k,entry[k]) for k in RAW_FIELDS])
+        except (KeyError,TypeError,IOError,OSError):
+            self.remove(entry_file)
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(entry_file,None)
+        except OSError:
+            pass
+
+        fields["block_stats"] = instruments.blockStatistics(fields["blocks"])
+
+        return RawExperiment(input_file=input_file,**fields)
+
+    def put(self,raw,signature=None):
+        """
+        Store a RawExperiment in the cache, then trim the cache to max_size.
+        signature (from fileSignature) should be taken before the file was
+        read, so that a file that changed while it was being read is not
+        stored as valid; if it is None, it is taken now.
+        """
+
+        if signature == None:
+            try:
+                signature = self.fileSignature(raw.input_file)
+            except (IOError,OSError):
+                return
+
+        entry = dict([(k,getattr(raw,k)) for k in RAW_FIELDS])
+        entry["version"] = CACHE_VERSION
+        entry["signature"] = signature
+
+        # Write to a temporary file and move it into place so that other
+        # processes never see a partial entry
+        entry_file = self.entryFile(raw.input_file)
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir,suffix=".tmp")
+        try:
+            f = os.fdopen(fd,'wb')
+            try:
+                cPickle.dump(entry,f,cPickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            if sys.platform.startswith("win"):
+                self.remove(entry_file)
+            os.rename(tmp_file,entry_file)
+        except (IOError,OSError):
+            self.remove(tmp_file)
+            return
+
+        self.trim()
+
+    def trim(self):
+        """
+        Remove the least recently used entries until the cache is no larger
+        than max_size.
+        """
+
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".raw"):
+                continue
+            entry_file = os.path.join(self.cache_dir,name)
+            try:
+                stat = os.stat(entry_file)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime,stat.st_size,entry_file))
+            total += stat.st_size
+
+        entries.sort()
+        for mtime, size, entry_file in entries:
+            if total <= self.max_size:
+                break
+            self.remove(entry_file)
+            total -= size
+
+    def remove(self,entry_file):
+        """
+        Remove a file from the cache directory, ignoring any errors.
+        """
+
+        try:
+            os.remove(entry_file)
+        except OSError:
+            pass
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".raw"):
+                self.remove(os.path.join(self.cache_dir,name))
+
+
+class MemoryCache:
+    """
+    Cache of RawExperiment instances held in memory, for long-running
+    processes.  It has the same get/put interface as ParseCache, so either
+    can be installed with setDefaultCache.  Entries are invalidated when the
+    size or modification time of the input file changes, and the least
+    recently used entries are dropped when there are more than max_entries.
+    RawExperiment instances can't be modified, so the same instance is
+    safely handed to every parser that asks for a file.
+    """
+
+    def __init__(self,max_entries=64):
+        """
+        Initialize instance of class.
+        """
+
+        self.max_entries = max_entries
+        self.entries = {}
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def fileSignature(self,input_file):
+        """
+        Return the values used to decide whether an entry is still valid.
+        """
+
+        stat = os.stat(input_file)
+
+        return (stat.st_size,stat.st_mtime)
+
+    def get(self,input_file):
+        """
+        Return the cached RawExperiment for input_file, or None if there is no
+        valid entry.
+        """
+
+        key = os.path.abspath(input_file)
+        try:
+            signature = self.fileSignature(input_file)
+        except OSError:
+            return None
+
+        self.lock.acquire()
+        try:
+            try:
+                entry_signature, raw, last_used = self.entries[key]
+            except KeyError:
+                return None
+
+            if entry_signature != signature:
+                del self.entries[key]
+                return None
+
+            self.counter += 1
+            self.entries[key] = (entry_signature,raw,self.counter)
+        finally:
+            self.lock.release()
+
+        # The same file may be asked for by another name
+        if raw.input_file != input_file:
+            fields = dict([(k,getattr(raw,k)) for k in RAW_FIELDS])
+            fields["block_stats"] = raw.block_stats
+            raw = RawExperiment(input_file=input_file,**fields)
+
+        return raw
+
+    def put(self,raw,signature=None):
+        """
+        Store a RawExperiment in the cache, dropping the least recently used
+        entries if there are more than max_entries.  signature is used as in
+        ParseCache.put.
+        """
+
+        if signature == None:
+            try:
+                signature = self.fileSignature(raw.input_file)
+            except OSError:
+                return
+
+        self.lock.acquire()
+        try:
+            self.counter += 1
+            self.entries[os.path.abspath(raw.input_file)] = \
+                (signature,raw,self.counter)
+
+            if len(self.entries) > self.max_entries:
+                by_use = [(v[2],k) for k, v in self.entries.items()]
+                by_use.sort()
+                for last_used, key in by_use[:-self.max_entries]:
+                    del self.entries[key]
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+
+        self.lock.acquire()
+        try:
+            self.entries = {}
+        finally:
+            self.lock.release()
+
+
+# The cache used by Aviv.loadExperiment.  False means that the environment has
+# not been checked yet.
+_default_cache = False
+
+def setDefaultCache(cache):
+    """
+    Install a ParseCache to be used whenever a file is loaded.  Pass None to
+    turn caching off.
+    """
+
+    global _default_cache
+    _default_cache = cache
+
+def getDefaultCache():
+    """
+    Return the ParseCache used whenever a file is loaded, or None if caching
+    is off.  The first call sets up a cache if AVIV_CACHE_DIR is set in the
+    environment (with its size cap in bytes taken from AVIV_CACHE_SIZE).
+    """
+
+    global _default_cache
+    if _default_cache is False:
+        _default_cache = None
+        cache_dir = os.environ.get(CACHE_DIR_VARIABLE)
+        if cache_dir:
+            kwargs = {}
+            try:
+                kwargs["max_size"] = int(os.environ[CACHE_SIZE_VARIABLE])
+            except (KeyError,ValueError):
+                pass
+            _default_cache = ParseCache(cache_dir,**kwargs)
+
+    return _default_cache
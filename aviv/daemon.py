@@ -0,0 +1,301 @@
+__description__ = \
+"""
+Resident processing daemon.  Starting python, importing this package and
+reading each file from scratch adds a fixed cost to every file processed by a
+script; the daemon pays it once.  It listens for HTTP requests on localhost
+and hands them to a pool of worker processes, each of which keeps the files
+(including blanks) it has read in a cache.
+
+Requests are JSON documents POSTed to /process:
+
+    {"input_file": "/data/101504bc.dat",
+     "kwargs": {"num_residues": 143, "molec_weight": 16116.0, ...},
+     "defaults": {"protein_conc": 50.0, ...},
+     "instrument_defaults": {"CD": {...}, "ATF": {...}},
+     "output": "text"}
+
+kwargs (the entries of a job), defaults and instrument_defaults are used as
+in a job spec (see batch.py).
+
+The reply holds the instrument and experiment type of the file and either
+the finalOutput() text ("output": "text") or the x, y and y_err arrays of
+each channel ("output": "arrays"), the time spent in each processing stage
+("profile", see stages.stageProfile), plus an error message if processing
+failed.  GET /status describes the daemon.  Client talks to a daemon.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, json, socket, threading
+import BaseHTTPServer, SocketServer
+import batch
+from errors import AvivError
+
+# Where the daemon listens by default (it only ever listens on localhost)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8715
+
+# Files kept in memory by each worker process
+CACHE_ENTRIES = 64
+
+def _startWorker(cache_entries):
+    """
+    Set up a worker process.  Files are kept in memory unless an on-disk
+    cache has been set up through the environment.
+    """
+
+    import cache
+
+    if cache.getDefaultCache() == None:
+        cache.setDefaultCache(cache.MemoryCache(cache_entries))
+
+
+def processRequest(request):
+    """
+    Process a single request (a dictionary read from the JSON sent to
+    /process) and return the reply as a dictionary.  Any error is returned
+    in the reply, so that a bad request can't take down a worker.
+    """
+
+    reply = {"input_file":None,"instrument":None,"exp_type":None,
+             "error":None}
+    try:
+        input_file = request["input_file"]
+        kwargs = batch.stringKeys(request.get("kwargs",{}))
+        defaults = batch.stringKeys(request.get("defaults",{}))
+        instrument_defaults = request.get("instrument_defaults",{})
+        instrument_defaults = dict([(str(k),batch.stringKeys(v)) for k, v in
+                                    instrument_defaults.items()])
+        output = request.get("output","text")
+        if output not in ("text","arrays"):
+            err = "output must be \"text\" or \"arrays\", not \"%s\"" % output
+            raise AvivError(err)
+    except (AttributeError,KeyError,TypeError), value:
+        reply["error"] = "Request is not valid: %s" % value
+        return reply
+
+    # stages imports numpy, which clients do without
+    import stages
+
+    start_profile = stages.stageProfile()
+
+    reply["input_file"] = input_file
+    try:
+        exp_id, parser_class, kwargs = batch.jobKwargs(input_file,kwargs,
+                                                       instrument_defaults,
+                                                       defaults)
+        reply["instrument"], reply["exp_type"] = exp_id
+
+        parser = parser_class()
+        parser.processFile(**kwargs)
+
+        if output == "text":
+            reply["output"] = parser.finalOutput()
+        else:
+            reply["channels"] = dict([(c.name,
+                                       {"x":[float(v) for v in c.x],
+                                        "y":[float(v) for v in c.y],
+                                        "y_err":[float(v) for v in
+                                                  c.column("y_err")]})
+                                      for c in parser.channel_list])
+
+    except (AvivError,IOError,OSError), value:
+        reply["error"] = str(value).strip()
+    except Exception, value:
+        reply["error"] = batch.unexpectedError(value)
+
+    reply["profile"] = stages.profileSince(start_profile)
+
+    return reply
+
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Handles a single HTTP request to the daemon.
+    """
+
+    def sendJSON(self,reply,status=200):
+        """
+        Send a dictionary back as JSON.
+        """
+
+        body = json.dumps(reply)
+
+        self.send_response(status)
+        self.send_header("Content-Type","application/json")
+        self.send_header("Content-Length",str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """
+        Describe the daemon.
+        """
+
+        if self.path != "/status":
+            self.sendJSON({"error":"Unknown path \"%s\"" % self.path},404)
+            return
+
+        self.sendJSON({"pid":os.getpid(),
+                       "workers":self.server.workers,
+                       "requests":self.server.num_requests})
+
+    def do_POST(self):
+        """
+        Process a file.
+        """
+
+        if self.path != "/process":
+            self.sendJSON({"error":"Unknown path \"%s\"" % self.path},404)
+            return
+
+        try:
+            length = int(self.headers.getheader("Content-Length"))
+            request = json.loads(self.rfile.read(length))
+        except (TypeError,ValueError), value:
+            self.sendJSON({"error":"Request is not valid: %s" % value},400)
+            return
+
+        self.server.countRequest()
+        self.sendJSON(self.server.pool.apply(processRequest,(request,)))
+
+    def log_message(self,format,*args):
+        """
+        Only log requests if the server was asked to.
+        """
+
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self,format,
+                                                              *args)
+
+
+class Daemon(SocketServer.ThreadingMixIn,BaseHTTPServer.HTTPServer):
+    """
+    HTTP server that processes files in a pool of worker processes.  Each
+    connection gets its own thread, which waits for a free worker.
+    """
+
+    daemon_threads = True
+
+    def __init__(self,port=DEFAULT_PORT,workers=None,
+                 cache_entries=CACHE_ENTRIES,verbose=False):
+        """
+        Initialize instance of class, starting the worker processes.
+        workers is the number of worker processes (None for one per CPU).
+        """
+
+        # Only the daemon itself needs multiprocessing, not its clients
+        import multiprocessing
+
+        if workers == None:
+            workers = multiprocessing.cpu_count()
+
+        # Start the workers first so they don't inherit the server socket
+        self.pool = multiprocessing.Pool(workers,_startWorker,
+                                         (cache_entries,))
+        self.workers = workers
+        self.verbose = verbose
+        self.num_requests = 0
+        self.count_lock = threading.Lock()
+
+        try:
+            BaseHTTPServer.HTTPServer.__init__(self,(DEFAULT_HOST,port),
+                                               RequestHandler)
+        except Exception:
+            self.pool.terminate()
+            raise
+
+    def countRequest(self):
+        """
+        Keep track of the number of files processed.
+        """
+
+        self.count_lock.acquire()
+        try:
+            self.num_requests += 1
+        finally:
+            self.count_lock.release()
+
+    def shutdown(self):
+        """
+        Stop serving and stop the worker processes.
+        """
+
+        BaseHTTPServer.HTTPServer.shutdown(self)
+        self.pool.close()
+        self.pool.join()
+
+
+class Client:
+    """
+    Simple client for a daemon running on this machine.
+    """
+
+    def __init__(self,port=DEFAULT_PORT,timeout=None):
+        """
+        Initialize instance of class.  timeout is in seconds (None to wait
+        as long as it takes).
+        """
+
+        self.port = port
+        self.timeout = timeout
+
+    def request(self,path,data=None):
+        """
+        Send a request to the daemon and return its JSON reply.  The request
+        is made over a plain socket (the daemon speaks HTTP/1.0 and closes
+        the connection after replying) rather than with urllib2, which takes
+        longer to import than most requests take to process.
+        """
+
+        if data == None:
+            message = "GET %s HTTP/1.0\r\n\r\n" % path
+        else:
+            data = json.dumps(data)
+            message = "POST %s HTTP/1.0\r\n" % path
+            message += "Content-Type: application/json\r\n"
+            message += "Content-Length: %i\r\n\r\n%s" % (len(data),data)
+
+        try:
+            connection = socket.create_connection((DEFAULT_HOST,self.port),
+                                                  self.timeout)
+            try:
+                connection.sendall(message)
+                response = []
+                while True:
+                    chunk = connection.recv(65536)
+                    if chunk == "":
+                        break
+                    response.append(chunk)
+            finally:
+                connection.close()
+
+            body = "".join(response).split("\r\n\r\n",1)[1]
+            return json.loads(body)
+
+        except (socket.error,IndexError,ValueError), value:
+            err = "Could not talk to daemon at %s:%i: %s" % (DEFAULT_HOST,
+                                                             self.port,value)
+            raise AvivError(err)
+
+    def process(self,input_file,output="text",instrument_defaults={},
+                defaults={},**kwargs):
+        """
+        Have the daemon process a file with kwargs, returning its reply (see
+        the module description).
+        """
+
+        request = {"input_file":os.path.abspath(input_file),
+                   "kwargs":kwargs,
+                   "defaults":defaults,
+                   "instrument_defaults":instrument_defaults,
+                   "output":output}
+
+        return self.request("/process",request)
+
+    def status(self):
+        """
+        Return the status of the daemon.
+        """
+
+        return self.request("/status")
@@ -0,0 +1,15 @@
+__description__ = \
+"""
+Exceptions raised by this package.  They are kept in their own module so that
+the parts of the package that do not process data (job specs, the daemon
+client) can use them without importing numpy.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+class AvivError(Exception):
+    """
+    General error class for this module.
+    """
+
+    pass
@@ -3,27 +3,104 @@ __author__ = "Michael J. Harms"
 __date__ = ""
 
 import os, sys
+import numpy
+import tokenizer, cache, summary
 from base import *
-from math import sqrt
 
 # A dictionary of alternate column names for when Aviv changes the names of 
 # their data columns randomly.
 ALTERNATE_COLUMN_KEYS = {"CD_Error":"Error"}
 
+# Columns that hold errors rather than signals.  When a file has several data
+# blocks these are combined as the root-sum-square rather than averaged.
+ERROR_COLUMNS = ["CD_Error","Error"]
+
+def blockMean(blocks):
+    """
+    Mean of an (n_blocks x ...) array of repeated data blocks over the
+    blocks.  With a single block, this is a view of the block itself.
+    """
+
+    if len(blocks) == 1:
+        return blocks[0]
+
+    return blocks.sum(axis=0)/len(blocks)
+
+
+def blockStd(blocks):
+    """
+    Population standard deviation of repeated data blocks over the blocks.
+    """
+
+    return numpy.sqrt(numpy.power(blocks - blockMean(blocks),2.0).sum(axis=0)/
+                      len(blocks))
+
+
+def blockMedian(blocks):
+    """
+    Median of repeated data blocks over the blocks.
+    """
+
+    return numpy.median(blocks,axis=0)
+
+
+def blockStatistics(blocks):
+    """
+    Reduce an (n_blocks x ...) array of repeated data blocks over the blocks.
+    Returns a dictionary with the "mean" and root-sum-square ("rss") of the
+    blocks, which are what the columns of a file are made of.  The spread of
+    the blocks (see blockStd and blockMedian) is only worked out for the
+    columns it is asked for.
+    """
+
+    rss = numpy.sqrt(numpy.power(blocks,2.0).sum(axis=0))
+
+    return {"mean":blockMean(blocks),"rss":rss}
+
+
+# Attributes worked out from the _blocks attribute of a column the first time
+# they are used, by suffix
+BLOCK_SPREADS = [("_std",blockStd),("_median",blockMedian)]
+
 class Aviv:
     """
     Class that allows for parsing and processing of general Aviv experiment
     files.
     """
 
-    def loadExperiment(self,input_file):
+    # Arguments for the ConfigAttribute instances extracted from every file
+    common_config = [("$EXPNAME","name","Name",str,"%s"),
+                     ("$EXDESC","description","Description",str,"%s"),
+                     ("$MDY","date","Date",str,"%s")]
+
+    def loadExperiment(self,input_file,raw=None):
         """
-        Load all data from an Aviv experiment.
+        Load all data from an Aviv experiment.  If raw (a RawExperiment
+        previously read from input_file) is given, or a parse cache is in use
+        and holds the file, the file is not read again.
         """
        
-        # Load data from file
+        # Load data from what was read before, the parse cache or the file
         self.input_file = input_file
-        self.loadFile()
+        parse_cache = cache.getDefaultCache()
+        if raw is None and parse_cache != None:
+            raw = parse_cache.get(input_file)
+            
+        if raw is None:
+            # Take the signature before reading, so that a file that grows
+            # while it is read is not cached as if it had been read whole
+            signature = None
+            if parse_cache != None:
+                try:
+                    signature = parse_cache.fileSignature(input_file)
+                except (IOError,OSError):
+                    pass
+
+            self.loadFile()
+            if signature != None:
+                parse_cache.put(self.raw,signature)
+        else:
+            self.useRaw(raw)
 
         # Extract configuration
         self.extractConfiguration()
@@ -32,10 +109,18 @@ class Aviv:
         self.extractData()
 
 
-    def loadFile(self):
+    def loadFile(self,skip_data=False):
         """
         Open and read an Aviv experiment file.  Does some basic sanity
-        checking.
+        checking.  The file is read in a single pass by tokenizer.tokenize;
+        the sections it finds are stored for the extraction methods.  If
+        skip_data is True, only the summary and configuration are read.  gzip,
+        bz2 and xz compressed files are decompressed as they are read.
+
+        Creates self.summary_lines, self.summary, self.config_lines,
+        self.config_index and self.section_offsets.  Unless skip_data is
+        True, also creates self.raw, a RawExperiment holding everything read
+        from the file.
         """
 
         # Make sure file exists
@@ -43,25 +128,326 @@ class Aviv:
             err = "\"%s\" does not exist!" % self.input_file
             raise AvivError(err)
 
-        # Read in contents of file
-        f = open(self.input_file,'r')
-        self.file_contents = f.readlines()
-        f.close()
+        self.summary_lines = []
+        self.config_lines = []
+        self.section_offsets = []
+        data_blocks = []
 
-        # Create simple list of keys that allows me to rapidly search file for
-        # entries.
-        self.file_keys = [l[0:6].strip() for l in self.file_contents]
+        # Read in contents of file (decompressing it if necessary)
+        try:
+            f = tokenizer.openFile(self.input_file)
+        except IOError, value:
+            err = "Could not read \"%s\": %s" % (self.input_file,value)
+            raise AvivError(err)
+        try:
+            for event, offset, payload in tokenizer.tokenize(f,skip_data):
+                self.section_offsets.append((event,offset))
+                if event == tokenizer.SUMMARY:
+                    self.summary_lines = payload
+                elif event == tokenizer.BLOCK:
+                    data_blocks.append(payload)
+                elif event == tokenizer.CONFIGURATION:
+                    self.config_lines = payload
+        finally:
+            f.close()
+
+        # Index the configuration keys and parse the summary once for all
+        # later lookups
+        self.config_index = tokenizer.indexConfiguration(self.config_lines)
+        self.summary = summary.Summary(self.summary_lines)
 
         # Determine the instrument type
-        if "$PMTHV" in self.file_keys:
-            instrument_from_file = "ATF"
-        elif "$CDHV:" in self.file_keys:
-            instrument_from_file = "CD"
-        else:
+        instrument_from_file = self.instrumentFromConfiguration()
+        if instrument_from_file == None:
             err = "Instrument type in file (%s) is not recognized!" % \
-                instrument_from_file
+                self.input_file
+            raise AvivError(err)
+
+        # Determine the experiment type from the first line of the summary
+        try:
+            exp_type_from_file = self.summary_lines[0].split(":")
+        except IndexError:
+            err = "No summary found in \"%s\"!" % self.input_file
+            raise AvivError(err)
+        exp_type_from_file = exp_type_from_file[-1].strip()
+
+        self.checkExperimentType(instrument_from_file,exp_type_from_file)
+
+        if skip_data:
+            return
+
+        # Convert the data blocks to arrays and keep everything that was read
+        # so that it can be reused without touching the file again
+        columns, blocks, bad_cells = self.blocksToArray(data_blocks)
+        self.raw = RawExperiment(input_file=self.input_file,
+                                 instrument=self.instrument,
+                                 exp_type=self.exp_type,
+                                 summary_lines=self.summary_lines,
+                                 config_lines=self.config_lines,
+                                 section_offsets=self.section_offsets,
+                                 columns=columns,
+                                 blocks=blocks,
+                                 block_stats=blockStatistics(blocks),
+                                 bad_cells=bad_cells)
+
+
+    def instrumentFromConfiguration(self):
+        """
+        Return the instrument ("ATF" or "CD") that wrote the configuration in
+        self.config_index, or None if it is not recognized.
+        """
+
+        if "$PMTHV" in self.config_index:
+            return "ATF"
+        elif "$CDHV" in self.config_index:
+            return "CD"
+
+        return None
+
+
+    def openLive(self,input_file,config_file=None):
+        """
+        Start following a file that is still being written by the instrument.
+        Only the data rows added since the last call to readTail are parsed,
+        so it can be called as often as needed.  Until the instrument writes
+        the configuration section (at the end of the file), the configuration
+        of config_file (e.g. an earlier run of the same method) is used, if
+        given.  Call readTail to read the file.
+        """
+
+        self.input_file = input_file
+        self.live_tokenizer = tokenizer.TailTokenizer()
+        self.live_summary_lines = []
+        self.live_config_lines = []
+        self.live_offsets = []
+        self.live_columns = None
+        self.live_blocks = []
+        self.live_bad_cells = []
+
+        self.live_template = []
+        if config_file != None:
+            f = tokenizer.openFile(config_file)
+            try:
+                for event, offset, payload in tokenizer.tokenize(f,True):
+                    if event == tokenizer.CONFIGURATION:
+                        self.live_template = payload
+            finally:
+                f.close()
+
+
+    def readTail(self):
+        """
+        Parse anything added to the live file (see openLive) since the last
+        call.  If there is anything new, self.raw is replaced by a
+        RawExperiment holding all of the data read so far and True is
+        returned.  If the file has been replaced by a shorter one, it is read
+        again from the start.
+
+        While a repeat of a multi-block experiment is being collected, the
+        data are those of the finished blocks.
+        """
+
+        if not os.path.isfile(self.input_file):
+            err = "\"%s\" does not exist!" % self.input_file
+            raise AvivError(err)
+
+        f = open(self.input_file,'rb')
+        try:
+            if os.fstat(f.fileno()).st_size < self.live_tokenizer.offset:
+                template = self.live_template
+                self.openLive(self.input_file)
+                self.live_template = template
+            events = self.live_tokenizer.read(f)
+        finally:
+            f.close()
+
+        changed = False
+        for event, offset, payload in events:
+            if event == tokenizer.ROWS:
+                columns, rows, bad_cells = self.blocksToArray([payload])
+                self.live_columns = columns
+                self.live_bad_cells.extend(bad_cells)
+                if len(self.live_blocks) != 0 and \
+                   self.live_blocks[-1][0] == offset:
+                    self.live_blocks[-1][1] = numpy.concatenate(
+                        (self.live_blocks[-1][1],rows[0]))
+                else:
+                    self.live_blocks.append([offset,rows[0]])
+                    self.live_offsets.append((tokenizer.BLOCK,offset))
+                changed = True
+            elif event == tokenizer.SUMMARY:
+                self.live_summary_lines = payload
+                self.live_offsets.append((event,offset))
+            elif event == tokenizer.CONFIGURATION:
+                if len(self.live_config_lines) == 0:
+                    self.live_offsets.append((event,offset))
+                self.live_config_lines = payload
+                changed = True
+            else:
+                self.live_offsets.append((event,offset))
+
+        if changed:
+            self.raw = self.liveRaw()
+
+        return changed
+
+
+    def liveRaw(self):
+        """
+        Build a RawExperiment from the data read so far from the live file.
+        """
+
+        if len(self.live_blocks) == 0:
+            err = "No data have been written to \"%s\" yet!" % self.input_file
+            raise AvivError(err)
+
+        # Leave out a repeat that is still being collected
+        block_arrays = [b[1] for b in self.live_blocks]
+        if len(block_arrays) > 1 and \
+           len(block_arrays[-1]) < len(block_arrays[0]):
+            block_arrays = block_arrays[:-1]
+
+        if len(set([a.shape for a in block_arrays])) != 1:
+            err = "Data blocks in file have different numbers of rows!"
+            raise AvivError(err)
+        blocks = numpy.array(block_arrays)
+
+        # Use the configuration template until the file has all of the
+        # configuration this class extracts
+        config_lines = self.live_config_lines
+        self.config_index = tokenizer.indexConfiguration(config_lines)
+        keys = [c[0] for c in self.common_config]
+        keys.extend([c.aviv_key for c in self.metadataAttributes()])
+        if len([k for k in keys if k not in self.config_index]) != 0:
+            config_lines = self.live_template
+            self.config_index = tokenizer.indexConfiguration(config_lines)
+
+        instrument = self.instrumentFromConfiguration()
+        if instrument == None:
+            try:
+                instrument = self.instrument
+            except AttributeError:
+                err = "Instrument type in file (%s) is not recognized!" % \
+                    self.input_file
+                raise AvivError(err)
+
+        try:
+            exp_type = self.live_summary_lines[0].split(":")[-1].strip()
+        except IndexError:
+            err = "No summary found in \"%s\"!" % self.input_file
             raise AvivError(err)
 
+        return RawExperiment(input_file=self.input_file,
+                             instrument=instrument,
+                             exp_type=exp_type,
+                             summary_lines=self.live_summary_lines,
+                             config_lines=config_lines,
+                             section_offsets=self.live_offsets,
+                             columns=self.live_columns,
+                             blocks=blocks,
+                             block_stats=blockStatistics(blocks),
+                             bad_cells=self.live_bad_cells)
+
+
+    def loadMetadata(self,input_file,source=None):
+        """
+        Read only the summary and configuration of an Aviv file (the data
+        section is skipped without being read) and return a dictionary with
+        the instrument, experiment type and the value of every configuration
+        attribute in self.metadataAttributes().  If source (an Unknown
+        instance that has already read the file) is given, the file is not
+        read again.
+        """
+
+        self.input_file = input_file
+        if source is None:
+            self.loadFile(skip_data=True)
+        else:
+            self.checkExperimentType(source.instrument,source.exp_type)
+            self.summary_lines = source.summary_lines
+            self.summary = source.summary
+            self.config_lines = source.config_lines
+            self.config_index = source.config_index
+            self.section_offsets = source.section_offsets
+
+        self.config_extract = self.metadataAttributes()
+        self.extractConfiguration()
+
+        record = {"input_file":self.input_file,
+                  "instrument":self.instrument,
+                  "exp_type":self.exp_type}
+        for c in self.config_extract:
+            try:
+                record[c.name] = c.value
+            except AttributeError:
+                pass
+
+        return record
+
+
+    def metadataAttributes(self):
+        """
+        Return new ConfigAttribute instances for all of the configuration this
+        class knows about: the instrument and experiment configuration, plus
+        that of every channel (whether or not it would be grabbed).  The
+        values extracted from every file are added by extractConfiguration.
+        """
+
+        config = []
+        for attribute in ["instrument_config","experiment_config"]:
+            try:
+                config.extend(getattr(self,attribute))
+            except AttributeError:
+                pass
+
+        try:
+            channel_config = self.channel_config
+        except AttributeError:
+            channel_config = {}
+        channels = channel_config.keys()
+        channels.sort()
+        for channel in channels:
+            config.extend(channel_config[channel])
+
+        # The same key may be defined by more than one class
+        attributes = []
+        keys = [c[0] for c in self.common_config]
+        for c in config:
+            if c[0] not in keys:
+                attributes.append(ConfigAttribute(*c))
+                keys.append(c[0])
+
+        return attributes
+
+
+    def useRaw(self,raw):
+        """
+        Take the contents of an Aviv file from a RawExperiment rather than
+        reading the file.
+        """
+
+        if raw.input_file != self.input_file:
+            err = "Previously read data are from \"%s\", not \"%s\"!" % \
+                (raw.input_file,self.input_file)
+            raise AvivError(err)
+
+        self.checkExperimentType(raw.instrument,raw.exp_type)
+
+        self.raw = raw
+        self.summary_lines = list(raw.summary_lines)
+        self.summary = summary.Summary(self.summary_lines)
+        self.config_lines = list(raw.config_lines)
+        self.config_index = raw.config
+        self.section_offsets = list(raw.section_offsets)
+
+
+    def checkExperimentType(self,instrument_from_file,exp_type_from_file):
+        """
+        Record the instrument and experiment type found in a file, making sure
+        they agree with any that were specified previously (i.e. by the
+        parsing class).
+        """
+
         # See if the instrument type has been specified previously and verify 
         # that they match
         try:
@@ -71,10 +457,6 @@ class Aviv:
         except AttributeError:
             self.instrument = instrument_from_file
 
-        # Determine the experiment type
-        exp_type_from_file = self.file_contents[1].split(":")
-        exp_type_from_file = exp_type_from_file[-1].strip()
-
         # See if exp type was specified previously and verify that they match
         try:
             if self.exp_type != exp_type_from_file:
@@ -96,120 +478,146 @@ class Aviv:
         # Create attributes in which to store data from columns
         columns_to_extract = self.data_extract.keys()
 
-        # Find how many data blocks there are and make a list for the starts and ends
-        try:
-            startl = [i for i,x in enumerate(self.file_keys) if x == "$MDCDA"]
-            
-            # The $ENDDATA key appears at the end of the entire data set.  When
-            # multiple data blocks are present, they are delimited by the start
-            # of the next block ($MDCNAME), or in the case of the last block by
-            # $ENDDATA.  Since the first block also contains $MDCNAME, we need
-            # to remove it with a pop()
-            endl = [i for i,x in enumerate(self.file_keys) if x in ("$ENDDA","$MDCNA")]
-            endl.pop(0)
-        except IndexError:
-            err = "Problem finding data blocks in file!"
-            raise AvivError(err)
-        
-        # If we have many data starts that means we have more than one set in the
-        # data file.
-        if len(startl) > 0: mult_datasets = True
-        else: mult_datasets = False
-
-        # A local functions to determine averages
-        def mean(numberList):
-            """ Average of the numbers """
-            floatNums = [float(x) for x in numberList]
-            return sum(floatNums) / len(numberList)
-        
-        def avg_error(numberList):
-            """ Sqrt of the sum of the squares """
-            floatNumsSquared = [pow(float(x),2) for x in numberList]
-            return sqrt(sum(floatNumsSquared))
-        
-        first_pass = True
-            
-        # Loop through start/ends for all of the data blocks
-        for start, end, ctr in zip(startl, endl, range(len(startl))):
-        
-            # Find start and end of data
-            try:
-                start = start+2
-                data = self.file_contents[start:end]
-            except IndexError:
-                err = "Problem locating data in file!"
+        # Grab name of each column in the file
+        columns_in_file = self.raw.columns
+        column_indexes = dict([(x,i) for i, x in enumerate(columns_in_file)])
+
+        # Look for columns that are supposed to be extracted but aren't found
+        for k in columns_to_extract[:]:
+
+            # If the specified column is missing, try to find another name for
+            # it in ALTERNATE_COLUMN_KEYS
+            if k not in columns_in_file:
+
+                # See if there is another global name for this column
+                try:
+                    new_key = ALTERNATE_COLUMN_KEYS[k]
+                except KeyError:
+                    continue
+
+                # If the alternate name for the column is found in the file,
+                # rename the key in self.data_extract
+                if new_key in columns_in_file:
+                    self.data_extract[new_key] = self.data_extract.pop(k)
+                    columns_to_extract.remove(k)
+                    columns_to_extract.append(new_key)
+
+        for c in columns_to_extract:
+            if c not in column_indexes:
+                print "Warning! Column \"%s\" not found!" % c
+
+        # Complain about any unreadable values in the columns we need
+        for column, line in self.raw.bad_cells:
+            if column in columns_to_extract:
+                err = "Problem with \"%s\" column on line:\n%s" % \
+                    (column,line)
                 raise AvivError(err)
-            
-            # Get column names on the first pass
-            if first_pass:
-                
-                first_pass = False
-                
-                # Grab name of each column in the file
-                columns_in_file = self.file_contents[start-1].split()
-                column_indexes = dict([(x,i) for i, x in enumerate(columns_in_file)])
-        
-                # Look for columns that are supposed to be extracted but aren't found
-                for k in columns_to_extract:
-        
-                    # If the specified column is missing, try to find another name for
-                    # it in ALTERNATE_COLUMN_KEYS
-                    if k not in columns_in_file:
-        
-                        # See if there is another global name for this column
-                        try:
-                            new_key = ALTERNATE_COLUMN_KEYS[k]
-                        except KeyError:
-                            continue
-        
-                        # If the alternate name for the column is found in the file,
-                        # rename the key in self.data_extract
-                        if new_key in columns_in_file:
-                            self.data_extract[new_key] = self.data_extract.pop(k)
-                            columns_to_extract.remove(k)
-                            columns_to_extract.append(new_key)
-                            
-                # Create attributes of self for each data column to be extracted.  Create
-                # empty ones for the normal numbers and for the averages
-                self.__dict__.update([(self.data_extract[c],[]) for c in columns_to_extract])
-                self.__dict__.update([(self.data_extract[c]+'_avg',[]) for c in columns_to_extract])
-                    
-                # The _avg attributes will hold a list of that attribute for each data block
-                for c in columns_to_extract:
-                    for i in range(len(startl)):
-                        self.__dict__[self.data_extract[c]+'_avg'].append([])
-                        
-            # Extract columns specified in self.data_extract.keys to attributes
-            # in self.data_extract.values
-            for line in data:
-                column = line.split()
-                for c in columns_to_extract:
-                    try:
-                        # Fill the _avg lists
-                        attribute = self.data_extract[c]+'_avg'
-                        index = column_indexes[c]
-                        value = float(column[index])
-                        self.__dict__[attribute][ctr].append(value)
-                    except KeyError:
-                        print "Warning! Column \"%s\" not found!" % c
-                        #raise AvivError(err)
-                    except ValueError:
-                        err = "Problem with \"%s\" column on line:\n%s" % (c,line)
-                        raise AvivError(err)
-                    
-        # Average the data and save it in the regular attribute
+
+        self.blocks = self.raw.blocks
+        self.block_stats = self.raw.block_stats
+        self.column_indexes = column_indexes
+
+        # Place each column in its attribute: the mean over the blocks, or the
+        # root-sum-square for error columns, copied so that it does not hold
+        # on to the other columns.  The _blocks attribute holds the
+        # (n_blocks x n_rows) values for the column; _std and _median hold the
+        # spread of the repeats (see __getattr__).
         for c in columns_to_extract:
             attribute = self.data_extract[c]
-            for i in range(len(self.__dict__[attribute+'_avg'][0])):
-                avg_l = []
-                for ctr in range(len(startl)):    
-                    avg_l.append(self.__dict__[attribute+'_avg'][ctr][i])
-                
-                # Make a guess that something is an error and treat it as such
-                if "ERR" in self.data_extract[c].upper():
-                    self.__dict__[attribute].append(avg_error(avg_l))
-                else:
-                    self.__dict__[attribute].append(mean(avg_l))                        
+            try:
+                index = column_indexes[c]
+            except KeyError:
+                self.__dict__[attribute] = numpy.zeros(0)
+                self.__dict__[attribute + "_blocks"] = \
+                    numpy.zeros((len(self.blocks),0))
+                continue
+
+            if c in ERROR_COLUMNS:
+                statistic = self.block_stats["rss"]
+            else:
+                statistic = self.block_stats["mean"]
+
+            self.__dict__[attribute] = \
+                numpy.ascontiguousarray(statistic[:,index])
+            self.__dict__[attribute + "_blocks"] = self.blocks[:,:,index]
+
+    def __getattr__(self,name):
+        """
+        Work out the spread of the blocks of an extracted column (e.g.
+        self.cd_signal_std) the first time it is asked for.
+        """
+
+        for suffix, statistic in BLOCK_SPREADS:
+            if not name.endswith(suffix):
+                continue
+
+            try:
+                blocks = self.__dict__[name[:-len(suffix)] + "_blocks"]
+            except KeyError:
+                break
+
+            value = statistic(blocks)
+            self.__dict__[name] = value
+            return value
+
+        raise AttributeError(name)
+
+    def blocksToArray(self,data_blocks):
+        """
+        Convert the raw lines of the data blocks found by the tokenizer into a
+        single (n_blocks x n_rows x n_columns) float array.  Each block is
+        converted in one call.  If a block can't be converted as a whole, it
+        is read line by line: unreadable cells become nan and are returned as
+        a list of (column name, line) so that problems can be reported if the
+        column is extracted.
+
+        Returns (column names, array, unreadable cells).
+        """
+
+        if len(data_blocks) == 0:
+            err = "Problem finding data blocks in file!"
+            raise AvivError(err)
+
+        # Grab name of each column in the file from the first block
+        columns = data_blocks[0][0]
+        num_columns = len(columns)
+
+        block_arrays = []
+        bad_cells = []
+        for block in data_blocks:
+
+            data = block[1]
+            cells = "".join(data).split()
+            block_array = None
+            if len(cells) == len(data)*num_columns:
+                try:
+                    block_array = numpy.array(cells,dtype=float)
+                    block_array = block_array.reshape(len(data),num_columns)
+                except ValueError:
+                    block_array = None
+
+            if block_array is None:
+                block_array = numpy.empty((len(data),num_columns))
+                block_array.fill(numpy.nan)
+                for i, line in enumerate(data):
+                    column = line.split()
+                    for j in range(num_columns):
+                        try:
+                            block_array[i,j] = float(column[j])
+                        except (IndexError,ValueError):
+                            bad_cells.append((columns[j],line))
+
+            block_arrays.append(block_array)
+
+        if len(set([a.shape for a in block_arrays])) != 1:
+            err = "Data blocks in file have different numbers of rows!"
+            raise AvivError(err)
+
+        # Turn any -0.0 values into 0.0 (in place), as summing them would
+        blocks = numpy.array(block_arrays)
+        blocks += 0.0
+
+        return columns, blocks, bad_cells
 
     def extractConfiguration(self):
         """
@@ -218,35 +626,26 @@ class Aviv:
         instances of ConfigureAttribute. 
         """
 
-        tmp_config_extract = [ConfigAttribute("$EXPNAME","name","Name",
-                                              str,"%s"),
-                              ConfigAttribute("$EXDESC","description",
-                                              "Description",str,"%s"),
-                              ConfigAttribute("$MDY","date","Date",
-                                              str,"%s")]
+        tmp_config_extract = [ConfigAttribute(*c) for c in self.common_config]
         self.config_extract = tmp_config_extract + self.config_extract
  
-        # Find config data
-        config_dict = dict([(c.aviv_key,c) for c in self.config_extract])
-        config_start = [l[0:7] for l in self.file_contents].index("$CONFIG") + 1
-        config_data = [l.split(":") for l in self.file_contents[config_start:]]
-        config_data = [d for d in config_data if d[0] in config_dict.keys()]
-
-        # Append to proper attributes
-        for l in config_data:
-            attribute = config_dict[l[0]].name
-            value_type = config_dict[l[0]].type
-
-            # Strip extra space.  If value has multiple parts (i.e. date), keep
-            # as a list.  Otherwise, make a single value.
-            values = []
-            for v in l[1:]:
-                values.append(value_type(v.strip()))
-            if len(values) == 1:
-                values = values[0]
-           
-            config_dict[l[0]].value = values
-            self.__dict__[attribute] = config_dict[l[0]] 
+        # Look up each attribute in the configuration index.  Values are
+        # converted when they are first used.
+        missing = []
+        for c in self.config_extract:
+            try:
+                c.bind(self.config_index[c.aviv_key])
+            except KeyError:
+                missing.append(c.aviv_key)
+                continue
+            self.__dict__[c.name] = c
+
+        # A file that is still being written may not have all of its
+        # configuration yet
+        if len(missing) != 0:
+            err = "%s not found in \"%s\"!" % (", ".join(missing),
+                                               self.input_file)
+            raise AvivError(err)
 
         # Extract data (special processing)
         self.raw_date = self.date.value
@@ -259,6 +658,22 @@ class Aviv:
                                         self.date.value[1])
 
 
+    def configValue(self,aviv_key,value_type=str):
+        """
+        Return the value of any key in the configuration section, converted
+        to value_type.  Raises AvivError if the key is not in the file.
+        """
+
+        try:
+            raw_value = self.config_index[aviv_key]
+        except KeyError:
+            err = "%s not found in \"%s\"!" % (aviv_key,self.input_file)
+            raise AvivError(err)
+
+        return ConfigAttribute(aviv_key,aviv_key,aviv_key,value_type,
+                               "%s").convert(raw_value)
+
+
     def createConfigHeader(self):
         """
         Generate a summary of the instrument configuration that can be placed
@@ -294,6 +709,13 @@ class CD(Aviv):
                          ("protein_conc",float,"required"),
                          ("path_length",float,"required")]
 
+    # Arguments for the ConfigAttribute instances extracted for any CD
+    # experiment
+    instrument_config = [("$MONOWL","wavelength","Wavelength",float,"%.3F"),
+                         ("$MONOBW","bandwidth","Bandwidth",float,"%.3F"),
+                         ("$TEMPSP","sample_temperature","Sample temperature",
+                          float,"%.3F")]
+
     def setupInstrumentExtraction(self,**kwargs):
         """
         Set up data_extract and config_extract to grab information
@@ -314,14 +736,8 @@ class CD(Aviv):
         self.concentrations = None
 
         # CD-specific configuration options to extract
-        self.config_extract.extend([ConfigAttribute("$MONOWL","wavelength",
-                                                    "Wavelength",float,"%.3F"),
-                                    ConfigAttribute("$MONOBW","bandwidth",
-                                                    "Bandwidth",float,"%.3F"),
-                                    ConfigAttribute("$TEMPSP",
-                                                    "sample_temperature",
-                                                    "Sample temperature",
-                                                    float,"%.3F")])
+        self.config_extract.extend([ConfigAttribute(*c)
+                                    for c in self.instrument_config])
 
         # Grab data from kwargs required for MME conversion
         try:
@@ -358,6 +774,22 @@ class ATF(Aviv):
                          ("reference",bool,"required"),
                          ("qc_corr",bool,"optional")]
 
+    # Arguments for the ConfigAttribute instances extracted for any ATF
+    # experiment, and for each channel that is grabbed
+    instrument_config = [("$EXWL","excitation_wavelength",
+                          "Excitation wavelength",float,"%.3F"),
+                         ("$EMWL","emission_wavelength","Emission wavelenth",
+                          float,"%.3F"),
+                         ("$EXBW","excitation_bandwidth",
+                          "Excitation bandwidth",float,"%.3F"),
+                         ("$EMBW","emission_bandwidth","Emission bandwidth",
+                          float,"%.3F")]
+
+    channel_config = {"sample":[("$TEMPSP","sample_temperature",
+                                 "Sample temperature",float,"%.3F")],
+                      "reference":[("$TEMPREFSP","ref_temperature",
+                                    "Reference temperature",float,"%.3F")]}
+
     def setupInstrumentExtraction(self,**kwargs):
         """
         Set up data_extract and config_extract to grab information
@@ -378,22 +810,8 @@ class ATF(Aviv):
         self.reference_concentrations = None
 
         # ATF specific configuration options to extract
-        self.config_extract.extend([ConfigAttribute("$EXWL",
-                                                    "excitation_wavelength",
-                                                    "Excitation wavelength",
-                                                    float, "%.3F"),
-                                    ConfigAttribute("$EMWL",
-                                                    "emission_wavelength",
-                                                   "Emission wavelenth",
-                                                   float, "%.3F"),
-                                    ConfigAttribute("$EXBW",
-                                                    "excitation_bandwidth",
-                                                   "Excitation bandwidth",
-                                                   float,"%.3F"),
-                                    ConfigAttribute("$EMBW",
-                                                    "emission_bandwidth",
-                                                   "Emission bandwidth",
-                                                   float,"%.3F")])
+        self.config_extract.extend([ConfigAttribute(*c)
+                                    for c in self.instrument_config])
 
 
         # --- Deal with channel specific data and configuration options --- #
@@ -412,18 +830,14 @@ class ATF(Aviv):
 
         if "sample" in to_grab and kwargs["sample"] == True:
             self.grab_sample = True
-            self.config_extract.append(ConfigAttribute("$TEMPSP",
-                                                       "sample_temperature",
-                                                       "Sample temperature",
-                                                       float,"%.3F"))
+            self.config_extract.extend([ConfigAttribute(*c) for c in
+                                        self.channel_config["sample"]])
             self.data_extract["Samp._PMT_Raw_Sig."] = "sample_y"
         
         if "reference" in to_grab and kwargs["reference"] == True:
             self.grab_reference = True
-            self.config_extract.append(ConfigAttribute("$TEMPREFSP",
-                                                       "ref_temperature",
-                                                       "Reference temperature",
-                                                       float,"%.3F"))
+            self.config_extract.extend([ConfigAttribute(*c) for c in
+                                        self.channel_config["reference"]])
             self.data_extract["Ref._PMT_Raw_Sig."] = "reference_y"
 
 
@@ -478,11 +892,15 @@ class Unknown(Aviv):
 
     def __init__(self,input_file):
         """
-        Initialize instance of the class.
+        Initialize instance of the class.  Only the summary and configuration
+        sections of the file are read; the data are skipped.
         """
         
         self.input_file = input_file
-        self.loadFile()
+        self.loadFile(skip_data=True)
+
+        self.config_extract = []
+        self.extractConfiguration()
 
 
     def identifyExperiment(self):
@@ -492,5 +910,18 @@ class Unknown(Aviv):
         """
 
         return (self.instrument,self.exp_type)
-    
 
+
+    def basicConfiguration(self):
+        """
+        Return a dictionary of basic information about the experiment that
+        can be used to sort files without parsing them.
+        """
+
+        return {"input_file":self.input_file,
+                "instrument":self.instrument,
+                "exp_type":self.exp_type,
+                "name":self.name.value,
+                "description":self.description.value,
+                "date":self.date.value}
+    
@@ -67,7 +67,10 @@ available_parsers = {("ATF","Titration"):  ATF_Titration,
 
 def preParse(input_file):
     """
-    
+    Identify and read an experiment file without processing it.  Returns a
+    parser whose channel_list, configuration and raw attribute (the
+    RawExperiment read from the file) are populated, so that the file can be
+    processed later without being read again.
     """
     
     # Create a dummy_parser
@@ -75,22 +78,38 @@ def preParse(input_file):
     dummy_parser = available_parsers[exp_id]()
     dummy_parser.exp_id = exp_id
  
-    # Make up values for required keywords for this parser, then parse file.
+    # Make up values for required keywords for this parser, then read file.
     # This allows extraction of instrument parameters, etc. prior to user input.
     kwarg_dict = dummy_parser.experiment_kwargs[:]
     kwarg_dict.extend(dummy_parser.instrument_kwargs)
     kwarg_dict = [(k[0],k[1](1)) for k in kwarg_dict if k[2] == "required"]
     kwarg_dict = dict(kwarg_dict)
 
-    # Do parsing and return experiment object
-    dummy_parser.processFile(input_file=input_file,**kwarg_dict)
-    
-    
+    # Do extraction (no processing) and return experiment object
+    dummy_parser.extractFile(input_file=input_file,**kwarg_dict)
     
     return dummy_parser
 
 
 
+def readMetadata(input_file):
+    """
+    Return a dictionary of the metadata of an experiment file (name,
+    description, date, wavelengths, bandwidths, temperature setpoints,
+    titration parameters, etc.) without reading its data.  This is fast
+    enough to catalogue large archives of files.
+    """
+
+    unknown = instruments.Unknown(input_file)
+    try:
+        parser = available_parsers[unknown.identifyExperiment()]()
+    except KeyError:
+        parser = unknown
+
+    return parser.loadMetadata(input_file,source=unknown)
+
+
+
 #import sys
 
 #yo(sys.argv[1])
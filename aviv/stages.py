@@ -0,0 +1,298 @@
+__description__ = \
+"""
+Registry of the stages used to process the channels of an experiment, and
+the engine that runs them.  Each experiment class lists the names of its
+stages, in order, in its pipeline attribute.  A stage says which Channel
+method does the work, when it applies and where its arguments come from;
+the text the method returns goes into the log of the output file.
+
+Stage conditions, and arguments that do not depend on the channel, are
+worked out once per file and shared by its channels.  The time spent in
+each stage is added to a process-wide profile (see stageProfile) so that
+the cost of each stage can be compared across a batch.  When steps are
+fused, the time spent applying each queued step is added to the stage that
+queued it.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import time
+import blanks
+from errors import AvivError
+
+# kwargs that ask for the denaturant concentrations to be corrected
+DENATURANT_KEYS = ["init_conc","titrant_conc","cell_vol"]
+
+class Stage:
+    """
+    A single processing stage.
+
+        name:        name the stage is registered under
+        method:      name of the Channel method that does the work
+        arguments:   function(parser,kwargs,channel) returning the (args,
+                     kwargs) to call method with
+        condition:   function(parser,kwargs) returning True if the stage
+                     should be run (None to always run it)
+        per_channel: True if arguments depends on the channel; otherwise it
+                     is called once per file (with channel None)
+    """
+
+    def __init__(self,name,method,arguments=None,condition=None,
+                 per_channel=False):
+        """
+        Initialize instance of class.
+        """
+
+        self.name = name
+        self.method = method
+        self.arguments = arguments
+        self.condition = condition
+        self.per_channel = per_channel
+
+    def run(self,parser,kwargs,channel,memo):
+        """
+        Run the stage on a channel, returning its log text.  memo holds what
+        has already been worked out for the file.
+        """
+
+        try:
+            applies, arguments = memo[self.name]
+        except KeyError:
+            applies = self.condition == None or self.condition(parser,kwargs)
+            arguments = ((),{})
+            if applies and self.arguments != None and not self.per_channel:
+                arguments = self.arguments(parser,kwargs,None)
+            memo[self.name] = (applies,arguments)
+
+        if not applies:
+            return ""
+
+        if self.per_channel:
+            arguments = self.arguments(parser,kwargs,channel)
+
+        args, method_kwargs = arguments
+
+        return getattr(channel,self.method)(*args,**method_kwargs)
+
+
+# Registered stages, by name
+available_stages = {}
+
+# Process-wide profile of stage names to [number of runs, seconds]
+profile = {}
+
+def registerStage(stage):
+    """
+    Make a Stage available to experiment pipelines.
+    """
+
+    available_stages[stage.name] = stage
+
+
+def recordTime(name,seconds):
+    """
+    Add a run of a stage to the profile.
+    """
+
+    try:
+        entry = profile[name]
+    except KeyError:
+        entry = [0,0.0]
+        profile[name] = entry
+
+    entry[0] += 1
+    entry[1] += seconds
+
+
+def stageProfile():
+    """
+    Return a copy of the profile: a dictionary of stage names to (number of
+    runs, seconds).
+    """
+
+    return dict([(k,tuple(v)) for k, v in profile.items()])
+
+
+def profileSince(earlier):
+    """
+    Return the part of the profile recorded since earlier (a copy returned
+    by stageProfile), e.g. the profile of a single file.
+    """
+
+    since = {}
+    for name, (runs, seconds) in profile.items():
+        earlier_runs, earlier_seconds = earlier.get(name,(0,0.0))
+        if runs != earlier_runs:
+            since[name] = (runs - earlier_runs,seconds - earlier_seconds)
+
+    return since
+
+
+def resetProfile():
+    """
+    Clear the profile.
+    """
+
+    profile.clear()
+
+
+def runPipeline(parser,pipeline,kwargs,fused=True):
+    """
+    Run the stages named in pipeline on each channel of parser, returning
+    the log text.  If fused is True, the steps of each channel are queued
+    and then applied together (see Channel.runSteps); the time spent
+    applying each step is still recorded under the stage that queued it.
+    """
+
+    try:
+        stages = [available_stages[name] for name in pipeline]
+    except KeyError, value:
+        err = "Processing stage %s is not registered!\n" % value
+        raise AvivError(err)
+
+    memo = {}
+    log = []
+    for c in parser.channel_list:
+
+        log.append("----- %s channel processing -----\n" % c.name.capitalize())
+
+        if fused:
+            c.deferSteps()
+
+        # Stage that queued each step
+        owners = []
+        seconds = {}
+        for stage in stages:
+            start = time.time()
+            log.append(stage.run(parser,kwargs,c,memo))
+            seconds[stage.name] = time.time() - start
+            if fused:
+                owners.extend([stage.name]*(len(c.pending) - len(owners)))
+
+        if fused:
+            step_times = [0.0 for name in owners]
+            c.runSteps(times=step_times)
+            for name, step_seconds in zip(owners,step_times):
+                seconds[name] += step_seconds
+
+        for stage in stages:
+            recordTime(stage.name,seconds[stage.name])
+
+        log.append("\n")
+
+    return "".join(log)
+
+
+# --------------------------- Standard stages ------------------------------ #
+
+def denaturantCondition(parser,kwargs):
+    """
+    Correct denaturant concentrations if any of DENATURANT_KEYS are given.
+    """
+
+    return len([k for k in DENATURANT_KEYS if k in kwargs]) != 0
+
+
+def denaturantArguments(parser,kwargs,channel):
+    """
+    The instrument values and the corrected values that were given.
+    """
+
+    instrument_values = [parser.init_conc,parser.titrant_conc,parser.cell_vol]
+    denat_corr_kwargs = dict([(k,kwargs[k]) for k in DENATURANT_KEYS
+                              if k in kwargs])
+
+    return (instrument_values,), denat_corr_kwargs
+
+
+def darkQCCondition(parser,kwargs):
+    """
+    Correct for the quantum counter if this is an ATF and it was asked for.
+    """
+
+    return parser.instrument == "ATF" and kwargs.get("qc_corr") == True
+
+
+def titrantBlankArguments(parser,kwargs,channel):
+    """
+    The buffer and titrant blanks for the channel.
+    """
+
+    prefix = {"sample":"sam","reference":"ref"}[channel.name]
+    try:
+        values = (kwargs["%s_buf" % prefix],kwargs["%s_titr" % prefix])
+    except KeyError:
+        err = "%s_buf and %s_titr blank values must be specified!\n" % \
+            (prefix,prefix)
+        raise AvivError(err)
+
+    return values, {}
+
+
+def CDCondition(parser,kwargs):
+    """
+    Run the stage for CD experiments only.
+    """
+
+    return parser.instrument == "CD"
+
+
+def MMEArguments(parser,kwargs,channel):
+    """
+    The protein information needed to convert to mean molar ellipticity.
+    """
+
+    return (parser.num_residues,parser.molec_weight,parser.protein_conc,
+            parser.path_length), {}
+
+
+def normalizeArguments(parser,kwargs,channel):
+    """
+    CD signals are inverted when they are normalized.
+    """
+
+    if parser.instrument == "CD":
+        return (), {"invert":True}
+
+    return (), {}
+
+
+def blankArguments(parser,kwargs,channel):
+    """
+    The blank file to subtract (None for none).  Without a blank_file, the
+    blank is looked up in the library of blank_dir, if one is given.  If
+    several blanks match, they are only averaged if blank_average is True,
+    as a sample scan collected the same way can't be told from a blank.
+    """
+
+    blank_file = kwargs.get("blank_file")
+    blank_dir = kwargs.get("blank_dir")
+    if blank_file == None and blank_dir != None:
+        blank_files = blanks.findBlank(blank_dir,parser)
+        if blank_files == None:
+            err = "No blank in \"%s\" matches \"%s\"!\n" % \
+                (blank_dir,parser.input_file)
+            raise AvivError(err)
+
+        if len(blank_files) == 1:
+            blank_file = blank_files[0]
+        elif kwargs.get("blank_average") == True:
+            blank_file = blank_files
+        else:
+            err = "Several blanks in \"%s\" match \"%s\" (\"%s\")!  Give " \
+                  "blank_file, or set blank_average to average them.\n" % \
+                (blank_dir,parser.input_file,"\", \"".join(blank_files))
+            raise AvivError(err)
+
+    return (blank_file,), {}
+
+
+registerStage(Stage("denaturant","correctDenaturant",denaturantArguments,
+                    denaturantCondition))
+registerStage(Stage("dark_qc","correctDarkQC",condition=darkQCCondition))
+registerStage(Stage("titrant_blanks","correctTitrantBlanks",
+                    titrantBlankArguments,per_channel=True))
+registerStage(Stage("dilution","correctDilution"))
+registerStage(Stage("MME","convertToMME",MMEArguments,CDCondition))
+registerStage(Stage("normalize","normalizeSignal",normalizeArguments))
+registerStage(Stage("blank","subtractBlank",blankArguments))
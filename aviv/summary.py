@@ -0,0 +1,185 @@
+__description__ = \
+"""
+Parser for the $SUMMARY section of Aviv experiment files.  The summary is a
+free-form, human readable description of how the experiment was collected:
+
+    Averaging Time       :   1.0 sec.
+    QC Correction is ENABLED
+    Concentration Schedule...
+    Target Concentration : 1.8    3    4
+    Stir Time            :  5.00 40.00  5.00 mins.
+    Domain 1: 0 molar -> 2 molar  in 0.1 molar steps:
+    Data Sets saved in this file :
+    Sample Signal
+
+The lines are parsed once, when a Summary is created, into dictionaries of
+typed values, units and flags so that individual fields can be looked up
+without any further text processing.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import re
+
+# "Domain 1: 0 molar -> 2 molar  in 0.1 molar steps:" lines describe the
+# titration schedule of CD titrations
+DOMAIN_PATTERN = re.compile(r"^Domain\s+(\d+)\s*:\s*(\S+)\s+(.*?)\s*->\s*"
+                            r"(\S+)\s+.*?\s+in\s+(\S+)\s+.*steps")
+
+# Lines that start a list or a table rather than holding a value
+SCHEDULE_LINE = "Concentration Schedule..."
+DATA_SETS_KEY = "Data Sets saved in this file"
+
+def convertNumber(text):
+    """
+    Convert text to an int or a float.  Raises ValueError if it is neither.
+    """
+
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def convertValue(text):
+    """
+    Convert the text after the ":" of a summary line to a (value, unit)
+    tuple.  Leading numbers are converted and the rest of the text is taken
+    as the unit: "1.8    3    4" gives ([1.8,3,4],""), " 25.00 deg C" gives
+    (25.0,"deg C").  Text that does not start with a number is returned as a
+    string with a unit of None; an empty value is None.
+    """
+
+    fields = text.split()
+    if len(fields) == 0:
+        return None, None
+
+    numbers = []
+    for f in fields:
+        try:
+            numbers.append(convertNumber(f))
+        except ValueError:
+            break
+
+    if len(numbers) == 0:
+        return text.strip(), None
+
+    unit = " ".join(fields[len(numbers):])
+    if len(numbers) == 1:
+        return numbers[0], unit
+
+    return numbers, unit
+
+
+class Summary:
+    """
+    Typed contents of the $SUMMARY section of an Aviv file.
+
+        values:    dictionary of "Key : value" entries converted with
+                   convertValue (number, list of numbers or string)
+        units:     dictionary with the unit of each entry in values
+        flags:     dictionary of "X is ENABLED/DISABLED" lines (True/False)
+        schedule:  dictionary of the multi-valued rows that follow
+                   "Concentration Schedule..." (e.g. "Target Concentration")
+        domains:   list of (start, end, step, unit) tuples from "Domain N:"
+                   lines
+        data_sets: list of the data sets saved in the file
+        notes:     all other lines (e.g. "Stir during measurments")
+    """
+
+    def __init__(self,summary_lines):
+        """
+        Initialize instance of class and parse summary_lines.
+        """
+
+        self.values = {}
+        self.units = {}
+        self.flags = {}
+        self.schedule = {}
+        self.domains = []
+        self.data_sets = []
+        self.notes = []
+
+        self.parse(summary_lines)
+
+    def parse(self,summary_lines):
+        """
+        Parse the lines of a $SUMMARY section.
+        """
+
+        in_schedule = False
+        in_data_sets = False
+        for line in summary_lines:
+
+            line = line.strip()
+            if line == "":
+                continue
+
+            # Everything after "Data Sets saved in this file" is a data set
+            if in_data_sets:
+                self.data_sets.append(line)
+                continue
+
+            if line == SCHEDULE_LINE:
+                in_schedule = True
+                continue
+
+            domain = DOMAIN_PATTERN.match(line)
+            if domain != None:
+                try:
+                    start, end, step = [convertNumber(domain.group(i))
+                                        for i in (2,4,5)]
+                    self.domains.append((start,end,step,domain.group(3)))
+                    continue
+                except ValueError:
+                    pass
+
+            entry = line.split(":",1)
+            if len(entry) == 1:
+                in_schedule = False
+                if line.endswith(" is ENABLED"):
+                    self.flags[line[:-len(" is ENABLED")].strip()] = True
+                elif line.endswith(" is DISABLED"):
+                    self.flags[line[:-len(" is DISABLED")].strip()] = False
+                else:
+                    self.notes.append(line)
+                continue
+
+            key = " ".join(entry[0].split())
+            if key == DATA_SETS_KEY:
+                in_data_sets = True
+                continue
+
+            value, unit = convertValue(entry[1])
+            self.values[key] = value
+            self.units[key] = unit
+
+            # The schedule is the run of multi-valued rows after its heading
+            if in_schedule:
+                if type(value) == list:
+                    self.schedule[key] = value
+                else:
+                    in_schedule = False
+
+    def get(self,key,default=None):
+        """
+        Return the value of a "Key : value" entry, or default if the summary
+        does not have it.
+        """
+
+        return self.values.get(" ".join(key.split()),default)
+
+    def unit(self,key):
+        """
+        Return the unit of a "Key : value" entry (None if there is none).
+        """
+
+        return self.units.get(" ".join(key.split()))
+
+    def flag(self,name,default=None):
+        """
+        Return True if "name is ENABLED" is in the summary, False if "name is
+        DISABLED" is, or default otherwise.
+        """
+
+        return self.flags.get(" ".join(name.split()),default)
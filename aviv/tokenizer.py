@@ -0,0 +1,419 @@
+__description__ = \
+"""
+Single-pass tokenizer for Aviv experiment files.  The file is read once, line
+by line, and broken into section events that can be consumed by anything that
+needs to look at the file (identification, configuration and data
+extraction).
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import io
+
+# Section events emitted by tokenize()
+SUMMARY = "$SUMMARY"
+DATA = "$DATA"
+BLOCK = "$MDCDATA"
+ENDDATA = "$ENDDATA"
+CONFIGURATION = "$CONFIGURATION"
+
+# Magic bytes at the start of compressed files
+GZIP_MAGIC = "\x1f\x8b"
+BZ2_MAGIC = "BZh"
+XZ_MAGIC = "\xfd7zXZ\x00"
+
+class CompressedFile:
+    """
+    Forward-only stream of the decompressed contents of a compressed file.
+    Lines are decompressed as they are read, so the whole file is never in
+    memory.  tokenize() does not try to seek in these files.
+    """
+
+    def __init__(self,f):
+        """
+        Initialize instance of class.
+        """
+
+        self.f = f
+
+    def __iter__(self):
+        """
+        Iterate over the lines of the decompressed file.
+        """
+
+        return iter(self.f)
+
+    def read(self,size=-1):
+        """
+        Read up to size bytes of the decompressed file.
+        """
+
+        return self.f.read(size)
+
+    def close(self):
+        """
+        Close the file.
+        """
+
+        self.f.close()
+
+
+def openFile(input_file):
+    """
+    Open an Aviv file for reading in binary mode.  gzip, bz2 and xz
+    compressed files are recognized by their first bytes and returned as a
+    CompressedFile that decompresses them as they are read.  Raises IOError
+    if an xz file is found and no lzma module is available.
+    """
+
+    f = open(input_file,'rb')
+    try:
+        magic = f.read(len(XZ_MAGIC))
+        f.seek(0)
+    except IOError:
+        f.close()
+        raise
+
+    # The decompression modules are only imported when they are needed, as
+    # most files are not compressed
+    if magic.startswith(GZIP_MAGIC):
+        f.close()
+        import gzip
+        return CompressedFile(io.BufferedReader(gzip.GzipFile(input_file,
+                                                              'rb')))
+    elif magic.startswith(BZ2_MAGIC):
+        f.close()
+        import bz2
+        return CompressedFile(bz2.BZ2File(input_file,'rb'))
+    elif magic.startswith(XZ_MAGIC):
+        f.close()
+        lzma = importLzma()
+        return CompressedFile(io.BufferedReader(lzma.LZMAFile(input_file,
+                                                              'rb')))
+
+    return f
+
+
+def importLzma():
+    """
+    Import the lzma module (from backports.lzma for python 2).  Raises
+    IOError if it is not available.
+    """
+
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            err = "Reading xz compressed files requires the lzma module "
+            err += "(backports.lzma for python 2)"
+            raise IOError(err)
+
+    return lzma
+
+
+def indexConfiguration(config_lines):
+    """
+    Build a dictionary that maps each $KEY in the configuration section to
+    the (unconverted) text that follows it.  Keys with no ":" map to None.  If
+    a key appears more than once, the last value wins.
+    """
+
+    index = {}
+    for line in config_lines:
+        entry = line.split(":",1)
+        if len(entry) == 2:
+            index[entry[0]] = entry[1]
+        else:
+            index[entry[0]] = None
+
+    return index
+
+
+def findConfiguration(f,chunk_size=4096):
+    """
+    Find the byte offset of the $CONFIGURATION line of a seekable file by
+    reading backwards from its end, so the data section never has to be read.
+    Returns None if the file can't be searched this way or the section is not
+    found.
+    """
+
+    marker = "\n" + CONFIGURATION
+
+    try:
+        f.seek(0,2)
+        position = f.tell()
+    except (AttributeError,IOError):
+        return None
+
+    # Read chunks from the end, keeping enough of the previous chunk to catch
+    # a marker that straddles two chunks
+    overlap = ""
+    while position > 0:
+        step = min(chunk_size,position)
+        position = position - step
+        f.seek(position)
+        chunk = f.read(step) + overlap
+        index = chunk.rfind(marker)
+        if index != -1:
+            return position + index + 1
+        overlap = chunk[:len(marker)]
+
+    if overlap.startswith(CONFIGURATION):
+        return 0
+
+    return None
+
+
+def tokenize(f,skip_data=False):
+    """
+    Generator that walks through an open (binary mode) Aviv file and yields
+    (event, offset, payload) tuples.  offset is the byte offset of the line
+    that started the section.  The payload depends on the event:
+
+        SUMMARY:       list of summary lines (line endings stripped)
+        DATA:          None
+        BLOCK:         (list of column names, list of raw data lines)
+        ENDDATA:       None
+        CONFIGURATION: list of "$KEY:value" lines (line endings stripped)
+
+    Because this is a generator, callers that only need the start of a file
+    can stop consuming it early.  If skip_data is True, no BLOCK events are
+    generated: when the file is seekable (and not a CompressedFile),
+    everything between $DATA and $CONFIGURATION is skipped without being
+    read.
+    """
+
+    section = None
+    start = 0
+    lines = []
+    columns = None
+
+    offset = 0
+    for line in f:
+
+        line_start = offset
+        offset += len(line)
+
+        if line[0:1] != "$":
+
+            # Column names follow directly after $MDCDATA
+            if section == BLOCK and not skip_data:
+                if columns == None:
+                    columns = line.split()
+                elif line.strip() != "":
+                    lines.append(line)
+
+            elif section in (SUMMARY,CONFIGURATION):
+                line = line.rstrip("\r\n")
+                if line.strip() != "":
+                    lines.append(line)
+
+            continue
+
+        key = line.split(":",1)[0].strip()
+
+        if section == CONFIGURATION:
+            if key == "$ENDCONFIGURATION":
+                yield (CONFIGURATION,start,lines)
+                section = None
+            else:
+                lines.append(line.rstrip("\r\n"))
+
+        elif key == SUMMARY:
+            section = SUMMARY
+            start = line_start
+            lines = []
+
+        elif key == "$ENDSUMMARY":
+            if section == SUMMARY:
+                yield (SUMMARY,start,lines)
+            section = None
+
+        elif key == DATA:
+            # Not all files have a $ENDSUMMARY line; $DATA closes the summary
+            if section == SUMMARY:
+                yield (SUMMARY,start,lines)
+            section = DATA
+            yield (DATA,line_start,None)
+
+            # Jump straight to the configuration at the end of the file.  The
+            # search moves the file position, so always seek back to where
+            # we should continue reading.  Compressed files can't be
+            # searched, so their data are read and ignored.
+            if skip_data and not isinstance(f,CompressedFile):
+                config_start = findConfiguration(f)
+                if config_start != None and config_start > offset:
+                    offset = config_start
+                try:
+                    f.seek(offset)
+                except (AttributeError,IOError):
+                    pass
+
+        elif key == "$MDCNAME":
+            # The name of the next block also ends the previous one
+            if section == BLOCK and not skip_data:
+                yield (BLOCK,start,(columns,lines))
+            section = DATA
+
+        elif key == BLOCK:
+            if section == BLOCK and not skip_data:
+                yield (BLOCK,start,(columns,lines))
+            section = BLOCK
+            start = line_start
+            columns = None
+            lines = []
+
+        elif key == ENDDATA:
+            if section == BLOCK and not skip_data:
+                yield (BLOCK,start,(columns,lines))
+            section = None
+            yield (ENDDATA,line_start,None)
+
+        elif key == CONFIGURATION:
+            section = CONFIGURATION
+            start = line_start
+            lines = []
+
+    # Flush sections that were not explicitly closed (i.e. no
+    # $ENDCONFIGURATION or a truncated file)
+    if section == SUMMARY:
+        yield (SUMMARY,start,lines)
+    elif section == BLOCK and not skip_data:
+        yield (BLOCK,start,(columns,lines))
+    elif section == CONFIGURATION:
+        yield (CONFIGURATION,start,lines)
+
+
+# Event generated by TailTokenizer for data rows added to a block
+ROWS = "$ROWS"
+
+class TailTokenizer:
+    """
+    Tokenizer for a file that is still being written.  Each call to read()
+    parses only the complete lines added since the last call and returns a
+    list of (event, offset, payload) tuples like those of tokenize(), with
+    these differences:
+
+        ROWS:          (list of column names, list of raw data lines) for the
+                       rows added to the block that starts at offset.  A
+                       block generates a ROWS event on every read that finds
+                       new rows for it.
+        CONFIGURATION: all of the configuration lines read so far, generated
+                       whenever more of them are found.
+
+    A line without its line ending is left for the next read, as the
+    instrument may still be writing it.
+    """
+
+    def __init__(self):
+        """
+        Initialize instance of class.
+        """
+
+        self.offset = 0
+        self.section = None
+        self.start = 0
+        self.columns = None
+        self.summary_lines = []
+        self.config_start = 0
+        self.config_lines = []
+
+    def read(self,f):
+        """
+        Parse everything appended to the open (binary mode) file f since the
+        last call.
+        """
+
+        f.seek(self.offset)
+        text = f.read()
+        end = text.rfind("\n") + 1
+        if end == 0:
+            return []
+
+        events = []
+        rows = []
+        config_changed = False
+
+        offset = self.offset
+        for line in text[:end].splitlines(True):
+
+            line_start = offset
+            offset += len(line)
+
+            if line[0:1] != "$":
+                if self.section == BLOCK:
+                    if self.columns == None:
+                        self.columns = line.split()
+                    elif line.strip() != "":
+                        rows.append(line)
+                elif self.section == SUMMARY:
+                    line = line.rstrip("\r\n")
+                    if line.strip() != "":
+                        self.summary_lines.append(line)
+                elif self.section == CONFIGURATION:
+                    line = line.rstrip("\r\n")
+                    if line.strip() != "":
+                        self.config_lines.append(line)
+                        config_changed = True
+                continue
+
+            # Any other section ends the rows read for the current block
+            if len(rows) != 0:
+                events.append((ROWS,self.start,(self.columns,rows)))
+                rows = []
+
+            key = line.split(":",1)[0].strip()
+
+            if self.section == CONFIGURATION:
+                if key == "$ENDCONFIGURATION":
+                    self.section = None
+                else:
+                    self.config_lines.append(line.rstrip("\r\n"))
+                    config_changed = True
+
+            elif key == SUMMARY:
+                self.section = SUMMARY
+                self.start = line_start
+                self.summary_lines = []
+
+            elif key == "$ENDSUMMARY":
+                if self.section == SUMMARY:
+                    events.append((SUMMARY,self.start,self.summary_lines))
+                self.section = None
+
+            elif key == DATA:
+                if self.section == SUMMARY:
+                    events.append((SUMMARY,self.start,self.summary_lines))
+                self.section = DATA
+                events.append((DATA,line_start,None))
+
+            elif key == "$MDCNAME":
+                self.section = DATA
+
+            elif key == BLOCK:
+                self.section = BLOCK
+                self.start = line_start
+                self.columns = None
+
+            elif key == ENDDATA:
+                self.section = None
+                events.append((ENDDATA,line_start,None))
+
+            elif key == CONFIGURATION:
+                self.section = CONFIGURATION
+                self.config_start = line_start
+                self.config_lines = []
+                config_changed = True
+
+        if len(rows) != 0:
+            events.append((ROWS,self.start,(self.columns,rows)))
+
+        if config_changed:
+            events.append((CONFIGURATION,self.config_start,
+                           list(self.config_lines)))
+
+        self.offset = offset
+
+        return events
@@ -0,0 +1,259 @@
+__description__ = \
+"""
+Watch a directory for new Aviv experiment files and process each one as soon
+as the instrument has finished writing it.  Files are identified with
+instruments.Unknown and processed by batch.processJob, using the defaults of
+a job spec for their instrument.  A file is only processed once its size and
+modification time have stopped changing for settle_time seconds and it can
+be identified (the configuration section is written last, so a file that is
+still being collected can't be).  Changes are picked up with inotify if
+pyinotify is installed, and by polling the directory otherwise.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, time
+import batch
+from errors import AvivError
+
+# pyinotify is optional; without it the directory is polled
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+# Files that are considered to be experiment files
+INPUT_EXTENSIONS = [".dat",".dat.gz",".dat.bz2",".dat.xz"]
+
+class Watcher:
+    """
+    Watches a single directory, processing new or changed experiment files.
+    """
+
+    def __init__(self,watch_dir,output_dir=None,defaults={},
+                 instrument_defaults={},settle_time=0.5,poll_interval=0.25,
+                 process_existing=False,report=None,use_inotify=True):
+        """
+        watch_dir:           directory to watch
+        output_dir:          directory for output (next to input if None)
+        defaults:            kwargs used to process every file
+        instrument_defaults: kwargs for each instrument ("CD","ATF")
+        settle_time:         seconds a file must be unchanged before it is
+                             processed
+        poll_interval:       seconds between checks for changes
+        process_existing:    process the files already in watch_dir
+        report:              function called with the batch.JobResult of
+                             each file processed
+        use_inotify:         use inotify (if pyinotify is installed)
+        """
+
+        if not os.path.isdir(watch_dir):
+            err = "\"%s\" is not a directory!" % watch_dir
+            raise AvivError(err)
+
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir
+        self.defaults = defaults
+        self.instrument_defaults = instrument_defaults
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+        self.report = report
+
+        # Signatures of files seen but not yet processed (with the time they
+        # were last seen to change) and of files already processed
+        self.pending = {}
+        self.done = {}
+
+        if not process_existing:
+            for input_file in self.listFiles():
+                signature = self.fileSignature(input_file)
+                if signature != None:
+                    self.done[input_file] = signature
+
+        self.notifier = None
+        if use_inotify and pyinotify != None:
+            self.setupInotify()
+
+    def setupInotify(self):
+        """
+        Have inotify tell us about files written to or moved into watch_dir.
+        """
+
+        changed = set()
+        self.inotify_changed = changed
+
+        class Handler(pyinotify.ProcessEvent):
+            def process_default(self,event):
+                changed.add(event.pathname)
+
+        mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MODIFY | \
+               pyinotify.IN_MOVED_TO | pyinotify.IN_CREATE
+
+        self.watch_manager = pyinotify.WatchManager()
+        self.notifier = pyinotify.Notifier(self.watch_manager,Handler(),
+                                           timeout=self.poll_interval*1000)
+        self.watch_manager.add_watch(self.watch_dir,mask)
+
+    def isInputFile(self,input_file):
+        """
+        Decide whether a file name is that of an experiment file (and not
+        the output of a previous run).
+        """
+
+        name = input_file.lower()
+        if name.endswith(batch.OUTPUT_SUFFIX.lower()):
+            return False
+
+        for extension in INPUT_EXTENSIONS:
+            if name.endswith(extension):
+                return True
+
+        return False
+
+    def listFiles(self):
+        """
+        Return the experiment files in watch_dir.
+        """
+
+        files = [os.path.join(self.watch_dir,f)
+                 for f in os.listdir(self.watch_dir)]
+
+        return [f for f in files if self.isInputFile(f) and os.path.isfile(f)]
+
+    def fileSignature(self,input_file):
+        """
+        Return (size, modification time) of a file, or None if it is gone.
+        """
+
+        try:
+            stat = os.stat(input_file)
+        except OSError:
+            return None
+
+        return (stat.st_size,stat.st_mtime)
+
+    def changedFiles(self):
+        """
+        Wait up to poll_interval for changes and return the files that may
+        have changed.
+        """
+
+        if self.notifier == None:
+            time.sleep(self.poll_interval)
+            return self.listFiles()
+
+        if self.notifier.check_events():
+            self.notifier.read_events()
+            self.notifier.process_events()
+
+        changed = [f for f in self.inotify_changed if self.isInputFile(f)]
+        self.inotify_changed.clear()
+
+        return changed
+
+    def update(self,changed,now):
+        """
+        Record which of the changed files are new or different from when they
+        were last seen.
+        """
+
+        for input_file in changed:
+            signature = self.fileSignature(input_file)
+            if signature == None:
+                self.pending.pop(input_file,None)
+                continue
+
+            if self.done.get(input_file) == signature:
+                continue
+
+            try:
+                if self.pending[input_file][0] == signature:
+                    continue
+            except KeyError:
+                pass
+
+            self.pending[input_file] = (signature,now)
+
+    def readyFiles(self,now):
+        """
+        Return the pending files that have not changed for settle_time.
+        """
+
+        ready = []
+        for input_file, (signature, last_change) in self.pending.items():
+
+            # inotify does not report the lack of change, so look again
+            if self.fileSignature(input_file) != signature:
+                self.update([input_file],now)
+                continue
+
+            if now - last_change >= self.settle_time:
+                ready.append(input_file)
+
+        ready.sort()
+
+        return ready
+
+    def processFile(self,input_file):
+        """
+        Process a single file that has stopped changing.  Returns its
+        batch.JobResult, or None if the file could not be identified.  That
+        usually means it is still being collected (the configuration is
+        written last); it is tried again the next time it changes.
+        """
+
+        signature, last_change = self.pending.pop(input_file)
+        self.done[input_file] = signature
+
+        job = batch.Job(input_file,{},defaults=self.defaults)
+        result = batch.processJob(job,self.output_dir,
+                                  self.instrument_defaults)
+        if result.instrument == None:
+            return None
+
+        if self.report != None:
+            self.report(result)
+
+        return result
+
+    def check(self):
+        """
+        Look for changes once and process any files that are ready.  Returns
+        the batch.JobResult of each file processed.  A file that can't be
+        processed is reported with its error and skipped until it changes
+        again, so one bad file does not stop the watcher.
+        """
+
+        self.update(self.changedFiles(),time.time())
+
+        results = []
+        for input_file in self.readyFiles(time.time()):
+            try:
+                result = self.processFile(input_file)
+            except Exception, value:
+                result = batch.JobResult(input_file,
+                                         error=batch.unexpectedError(value))
+                if self.report != None:
+                    self.report(result)
+
+            if result != None:
+                results.append(result)
+
+        return results
+
+    def run(self):
+        """
+        Watch the directory until interrupted.
+        """
+
+        # Anything already pending (e.g. process_existing) is picked up by
+        # the first poll; with inotify it has to be added here
+        if self.notifier != None:
+            self.update(self.listFiles(),time.time())
+
+        try:
+            while True:
+                self.check()
+        finally:
+            if self.notifier != None:
+                self.notifier.stop()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+__author__ = "Michael J. Harms"
+__date__ = ""
+__version__= "0.3"
+__description__ = \
+"""
+Run the processing daemon (see aviv/daemon.py), or, with --client, send the
+files of a JSON job spec (see aviv/batch.py) to a running daemon and write
+their output.
+"""
+
+# Import python standard modules
+import sys, os
+from optparse import OptionParser
+
+# Import program modules
+import aviv
+from aviv import batch, daemon
+from aviv.parsers import AvivError
+
+def serve(options):
+    """
+    Run the daemon until interrupted.
+    """
+
+    server = daemon.Daemon(options.port,options.workers,
+                           verbose=options.verbose)
+    print "Listening on %s:%i with %i workers" % (daemon.DEFAULT_HOST,
+                                                   options.port,
+                                                   server.workers)
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    server.server_close()
+    server.pool.terminate()
+
+    return 0
+
+def sendJobs(options,spec_file,input_files):
+    """
+    Have a running daemon process each job of a job spec, writing the
+    output.  Returns the number of jobs that failed.
+    """
+
+    input_files = [os.path.abspath(f) for f in input_files]
+    jobs, defaults, output_dir, instrument_defaults = \
+        batch.readJobSpec(spec_file,input_files)
+
+    client = daemon.Client(options.port)
+
+    num_failed = 0
+    for job in jobs:
+        reply = client.process(job.input_file,"text",instrument_defaults,
+                               job.defaults,**job.kwargs)
+        if reply["error"] != None:
+            num_failed += 1
+            print >> sys.stderr, "%s: %s" % (job.input_file,reply["error"])
+            continue
+
+        output_file = job.output_file
+        if output_file == None:
+            output_file = batch.outputName(job.input_file,output_dir)
+
+        try:
+            batch.writeOutput(output_file,reply["output"])
+        except (IOError,OSError), value:
+            num_failed += 1
+            print >> sys.stderr, "%s: %s" % (output_file,value)
+            continue
+
+        print "%s -> %s" % (job.input_file,output_file)
+
+    return num_failed
+
+def main(argv=None):
+    """
+    Parse the command line and run the daemon or client.
+    """
+
+    if argv == None:
+        argv = sys.argv[1:]
+
+    usage = "%prog [options]\n"
+    usage += "       %prog --client job_spec.json [input_file ...]"
+    option_parser = OptionParser(usage=usage,description=__description__)
+    option_parser.add_option("-p","--port",dest="port",type="int",
+                             default=daemon.DEFAULT_PORT,
+                             help="port to listen on (localhost only)")
+    option_parser.add_option("-w","--workers",dest="workers",type="int",
+                             help="number of worker processes (default: "
+                                  "one per CPU)")
+    option_parser.add_option("-v","--verbose",dest="verbose",default=False,
+                             action="store_true",help="log each request")
+    option_parser.add_option("-c","--client",dest="client",default=False,
+                             action="store_true",
+                             help="send a job spec to a running daemon")
+    options, args = option_parser.parse_args(argv)
+
+    try:
+        if options.client:
+            if len(args) == 0:
+                option_parser.error("a job spec must be given")
+            return min(sendJobs(options,args[0],args[1:]),1)
+
+        return serve(options)
+
+    except AvivError, value:
+        print >> sys.stderr, value
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
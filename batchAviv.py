@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+__author__ = "Michael J. Harms"
+__date__ = ""
+__version__= "0.3"
+__description__ = \
+"""
+Process Aviv experiment files without the GUI.  The files to process, and the
+options to process them with, are read from a JSON job spec (see aviv/batch.py
+for its format).  Extra input files can be given on the command line; they
+are processed with the job spec defaults.
+"""
+
+# Import python standard modules
+import sys, os
+from optparse import OptionParser
+
+# Import program modules
+import aviv
+from aviv import batch
+from aviv.parsers import AvivError
+
+def main(argv=None):
+    """
+    Parse the command line and process each job, reporting any failures.
+    Returns the number of jobs that failed.
+    """
+
+    if argv == None:
+        argv = sys.argv[1:]
+
+    usage = "%prog [options] job_spec.json [input_file ...]"
+    option_parser = OptionParser(usage=usage,description=__description__)
+    option_parser.add_option("-o","--output-dir",dest="output_dir",
+                             help="write output files to OUTPUT_DIR")
+    option_parser.add_option("-j","--jobs",dest="processes",type="int",
+                             default=1,
+                             help="process files in PROCESSES worker "
+                                  "processes (0 for one per CPU)")
+    option_parser.add_option("-q","--quiet",dest="quiet",default=False,
+                             action="store_true",
+                             help="only report jobs that fail")
+    option_parser.add_option("-p","--profile",dest="profile",default=False,
+                             action="store_true",
+                             help="report the time spent in each stage")
+    options, args = option_parser.parse_args(argv)
+
+    if len(args) == 0:
+        option_parser.error("a job spec must be given")
+
+    input_files = [os.path.abspath(f) for f in args[1:]]
+    try:
+        jobs, defaults, output_dir, instrument_defaults = \
+            batch.readJobSpec(args[0],input_files)
+    except AvivError, value:
+        print >> sys.stderr, value
+        return 1
+
+    if options.output_dir != None:
+        output_dir = options.output_dir
+
+    processes = options.processes
+    if processes < 1:
+        processes = None
+
+    # Report each job as it finishes
+    def progress(num_done,num_jobs,result):
+        if result.error != None:
+            print >> sys.stderr, "[%i/%i] %s: %s" % (num_done,num_jobs,
+                                                     result.input_file,
+                                                     result.error)
+        elif not options.quiet:
+            print "[%i/%i] %s -> %s" % (num_done,num_jobs,result.input_file,
+                                        result.output_file)
+
+    results = batch.processJobs(jobs,output_dir,instrument_defaults,
+                                processes,progress)
+
+    num_failed = len([r for r in results if r.error != None])
+
+    if options.profile:
+        profile = batch.mergeProfiles([r.profile for r in results])
+        by_time = [(v[1],k,v[0]) for k, v in profile.items()]
+        by_time.sort(reverse=True)
+
+        print "%-20s %8s %12s" % ("stage","runs","seconds")
+        for seconds, name, runs in by_time:
+            print "%-20s %8i %12.4f" % (name,runs,seconds)
+
+    return num_failed
+
+if __name__ == "__main__":
+    sys.exit(min(main(),1))
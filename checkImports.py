@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+__author__ = "Michael J. Harms"
+__date__ = ""
+__version__= "0.3"
+__description__ = \
+"""
+Measure how long it takes to import the processing core and check it against
+a budget.  Each module is imported in a fresh interpreter (best of several
+runs), after its baseline (e.g. numpy, which the core needs and we can do
+nothing about) has been imported, and the time the import takes is compared
+with the budget.  Also checks that each module can be imported on its own,
+that no GUI module is imported by the core, and that the modules used by job
+specs and the daemon client do not import numpy.  Returns a non-zero exit
+status if anything is over budget.  Imports are timed from a compiled copy
+of the core in a temporary directory, as an installed copy would be, so the
+result does not depend on whether the tree has bytecode; use --in-place to
+time the tree as it is.
+"""
+
+# Import python standard modules
+import sys, os, glob, shutil, tempfile, subprocess, compileall
+from optparse import OptionParser
+
+# (module, module imported before timing starts, budget in ms, modules that
+# must not be imported)
+GUI_MODULES = ["Tkinter","tkModule","tkMessageBox","tkFileDialog"]
+BUDGETS = [("aviv",None,1.0,GUI_MODULES + ["numpy"]),
+           ("aviv.batch",None,5.0,GUI_MODULES + ["numpy"]),
+           ("aviv.daemon",None,20.0,GUI_MODULES + ["numpy"]),
+           ("aviv.base","numpy",5.0,GUI_MODULES),
+           ("aviv.instruments","numpy",5.0,GUI_MODULES),
+           ("aviv.experiments","numpy",5.0,GUI_MODULES),
+           ("aviv.cache","numpy",5.0,GUI_MODULES),
+           ("aviv.parsers","numpy",5.0,GUI_MODULES),
+           ("denaturantModule",None,1.0,GUI_MODULES + ["numpy"])]
+
+# Code run by each fresh interpreter.  Prints the time taken by the import
+# (in ms) and any forbidden modules that were loaded.
+IMPORT_TEMPLATE = \
+"""
+import sys, time
+sys.path.insert(0,%r)
+%s
+start = time.time()
+import %s
+elapsed = (time.time() - start)*1000
+print elapsed, " ".join([m for m in %r if m in sys.modules])
+"""
+
+def compiledCopy(root):
+    """
+    Copy the aviv package and the top-level modules in root into a temporary
+    directory and compile them to bytecode.  Returns the directory.
+    """
+
+    copy_dir = tempfile.mkdtemp(prefix="checkImports")
+    shutil.copytree(os.path.join(root,"aviv"),os.path.join(copy_dir,"aviv"),
+                    ignore=shutil.ignore_patterns("*.pyc"))
+    for module_file in glob.glob(os.path.join(root,"*.py")):
+        shutil.copy(module_file,copy_dir)
+
+    compileall.compile_dir(copy_dir,quiet=True)
+
+    return copy_dir
+
+def timeImport(root,module,baseline,forbidden,num_runs):
+    """
+    Import module from root in num_runs fresh interpreters (after importing
+    baseline, if given), returning the shortest time (in ms) taken by the
+    import and any forbidden modules that were imported.  Returns None for
+    the time if the module could not be imported.
+    """
+
+    if baseline == None:
+        baseline = ""
+    else:
+        baseline = "import %s" % baseline
+    code = IMPORT_TEMPLATE % (root,baseline,module,forbidden)
+
+    best = None
+    for i in range(num_runs):
+        process = subprocess.Popen([sys.executable,"-c",code],
+                                   stdout=subprocess.PIPE)
+        output = process.communicate()[0].split()
+        if process.returncode != 0:
+            return None, []
+
+        elapsed = float(output[0])
+        if best == None or elapsed < best:
+            best = elapsed
+
+    return best, output[1:]
+
+def main(argv=None):
+    """
+    Measure each module in BUDGETS and report.  Returns the number of
+    modules over budget (or importing a forbidden module).
+    """
+
+    if argv == None:
+        argv = sys.argv[1:]
+
+    option_parser = OptionParser(usage="%prog [options]",
+                                 description=__description__)
+    option_parser.add_option("-n","--runs",dest="num_runs",type="int",
+                             default=10,help="runs to time each import")
+    option_parser.add_option("-i","--in-place",dest="in_place",
+                             action="store_true",default=False,
+                             help="time the tree as it is, not a compiled copy")
+    options, args = option_parser.parse_args(argv)
+
+    # Time imports from bytecode, as an installed copy would be
+    root = os.path.dirname(os.path.abspath(__file__))
+    if not options.in_place:
+        root = compiledCopy(root)
+
+    try:
+        num_failed = checkBudgets(root,options.num_runs)
+    finally:
+        if not options.in_place:
+            shutil.rmtree(root)
+
+    return num_failed
+
+def checkBudgets(root,num_runs):
+    """
+    Time the import of each module in BUDGETS from root and report.  Returns
+    the number of modules over budget (or importing a forbidden module).
+    """
+
+    num_failed = 0
+    print "%-20s %-10s %10s %10s" % ("module","after","time (ms)","budget")
+    for module, baseline, budget, forbidden in BUDGETS:
+        elapsed, loaded = timeImport(root,module,baseline,forbidden,num_runs)
+
+        if elapsed == None:
+            num_failed += 1
+            print "%-20s %-10s %10s %10.1f %s" % (module,baseline or "-","-",
+                                                   budget,"IMPORT FAILED")
+            continue
+
+        status = ""
+        if elapsed > budget:
+            status = "OVER BUDGET"
+        if len(loaded) != 0:
+            status = "imports %s" % ", ".join(loaded)
+        if status != "":
+            num_failed += 1
+
+        print "%-20s %-10s %10.1f %10.1f %s" % (module,baseline or "-",
+                                                 elapsed,budget,status)
+
+    return num_failed
+
+if __name__ == "__main__":
+    sys.exit(min(main(),1))
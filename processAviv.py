@@ -509,28 +509,21 @@ class MainWindow:
         # Create header
         self.createHeader()
 
-        # Combine output
-        output_lines = self.final_output.split("\n")
-        output_lines = ["%s\n" % l for l in output_lines]
-        self.combined_out = "".join(["".join(output_lines[:4]),self.header,
-                                     "".join(output_lines[5:])])
-        
         # Save output
         self.saveOutput() 
 
     def processExperiment(self):
         """
-        Process experiment.  Populates self.final_experiment and
-        self.final_output.
+        Process experiment.  Populates self.final_experiment.
         """
 
         # Select the correct parser class
         parser = available_parsers[self.tmp_exp.exp_id]
        
-        # Do parsing 
+        # Do processing, reusing the data read when the file was loaded
         self.final_experiment = parser()
-        self.final_experiment.processFile(**self.to_parser)
-        self.final_output = self.final_experiment.finalOutput()
+        self.final_experiment.processFile(raw=self.tmp_exp.raw,
+                                          **self.to_parser)
         
         
     
@@ -662,10 +655,13 @@ class MainWindow:
         if self.output_file in ("",None):
             return
 
-        # Save file
+        # Save file, with the header describing the experiment after the
+        # experiment information
         f = open(self.output_file,'w')
-        f.write(self.combined_out)
-        f.close()
+        try:
+            self.final_experiment.writeOutput(f,self.header)
+        finally:
+            f.close()
 
 # Start the main loop
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+__description__ = \
+"""
+Tests for the shared processing code in aviv/base.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, unittest
+import numpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, base
+from aviv.errors import AvivError
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class RawExperimentTests(unittest.TestCase):
+
+    def setUp(self):
+        self.raw = parsers.preParse(os.path.join(TEST_FILES,
+                                                 "cd_gdn.dat")).raw
+
+    def testConfigReadOnly(self):
+        """
+        The configuration index of a raw experiment cannot be changed.
+        """
+
+        self.assertRaises(AvivError,self.raw.config.__setitem__,"$MDY",0)
+        self.assertRaises(AvivError,self.raw.config.update,{})
+        self.assertRaises(AvivError,self.raw.block_stats.clear)
+
+    def testAttributesReadOnly(self):
+        """
+        Attributes of a raw experiment cannot be set.
+        """
+
+        self.assertRaises(AvivError,setattr,self.raw,"config",{})
+        self.assertRaises(ValueError,self.raw.blocks.__setitem__,0,0.0)
+
+
+def titrantLoop(shot_size,init_conc,titrant_conc,cell_vol):
+    """
+    The recurrence titrantConcentrations evaluates, one shot at a time.
+    """
+
+    titrant = [init_conc]
+    for s in shot_size[1:]:
+        s = s/1000.
+        titrant.append(titrant[-1]*(cell_vol - s)/cell_vol +
+                       s*titrant_conc/cell_vol)
+
+    return numpy.array(titrant)
+
+
+class TitrantConcentrationTests(unittest.TestCase):
+
+    def testMatchesLoop(self):
+        """
+        The concentrations agree with the recurrence.
+        """
+
+        shot_size = [0.0,20.0,20.0,50.0,100.0,10.0]
+        expected = titrantLoop(shot_size,0.1,6.0,3.0)
+        titrant = base.titrantConcentrations(shot_size,0.1,6.0,3.0)
+        self.assertTrue(numpy.allclose(titrant,expected,rtol=1e-14,atol=0))
+
+    def testFullShot(self):
+        """
+        A shot that replaces the whole cell leaves it at titrant_conc.
+        """
+
+        shot_size = [0.0,100.0,3000.0,100.0]
+        expected = titrantLoop(shot_size,0.1,6.0,3.0)
+        titrant = base.titrantConcentrations(shot_size,0.1,6.0,3.0)
+        self.assertTrue(numpy.all(numpy.isfinite(titrant)))
+        self.assertTrue(numpy.allclose(titrant,expected,rtol=1e-14,atol=0))
+        self.assertEqual(titrant[2],6.0)
+
+    def testLongRun(self):
+        """
+        A run of shots long enough for the dilution to underflow approaches
+        titrant_conc.
+        """
+
+        shot_size = [0.0] + [1000.0]*5000
+        expected = titrantLoop(shot_size,0.1,6.0,2.0)
+        titrant = base.titrantConcentrations(shot_size,0.1,6.0,2.0)
+        self.assertTrue(numpy.all(numpy.isfinite(titrant)))
+        self.assertTrue(numpy.allclose(titrant,expected,rtol=1e-12,atol=0))
+        self.assertEqual(titrant[-1],6.0)
+
+    def testBroadcast(self):
+        """
+        Arrays of candidate values are corrected in one call.
+        """
+
+        shot_size = [0.0,20.0,20.0,50.0]
+        titrant_conc = numpy.array([[5.0],[6.0],[7.0]])
+        titrant = base.titrantConcentrations(shot_size,0.1,titrant_conc,3.0)
+
+        self.assertEqual(titrant.shape,(3,4))
+        for i in range(3):
+            expected = titrantLoop(shot_size,0.1,titrant_conc[i,0],3.0)
+            self.assertTrue(numpy.allclose(titrant[i],expected,rtol=1e-14,
+                                           atol=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
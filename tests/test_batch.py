@@ -0,0 +1,123 @@
+__description__ = \
+"""
+Tests for headless batch processing in aviv/batch.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, json, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, batch
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class JobSpecTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.spec_file = os.path.join(self.tmp_dir,"spec.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def writeSpec(self,spec):
+        f = open(self.spec_file,'w')
+        json.dump(spec,f)
+        f.close()
+
+    def testPrecedence(self):
+        """
+        instrument_defaults override defaults, and job entries override
+        both.
+        """
+
+        self.writeSpec({"defaults":{"path_length":1.0,"protein_conc":50.0},
+                        "instrument_defaults":{"CD":{"path_length":0.1}},
+                        "jobs":[os.path.join(TEST_FILES,"cd_base.dat"),
+                                {"input_file":os.path.join(TEST_FILES,
+                                                           "cd_base.dat"),
+                                 "path_length":0.5}]})
+        jobs, defaults, output_dir, instrument_defaults = \
+            batch.readJobSpec(self.spec_file)
+
+        kwargs = [batch.jobKwargs(j.input_file,j.kwargs,instrument_defaults,
+                                  j.defaults)[2] for j in jobs]
+        self.assertEqual(kwargs[0]["path_length"],0.1)
+        self.assertEqual(kwargs[1]["path_length"],0.5)
+        self.assertEqual(kwargs[0]["protein_conc"],50.0)
+
+    def testPaths(self):
+        """
+        Path-valued kwargs are taken relative to the job spec.
+        """
+
+        self.writeSpec({"defaults":{"blank_dir":"blanks"},
+                        "jobs":[{"input_file":"a.dat",
+                                 "blank_file":["b1.dat","b2.dat"]}]})
+        jobs, defaults, output_dir, instrument_defaults = \
+            batch.readJobSpec(self.spec_file)
+
+        self.assertEqual(defaults["blank_dir"],
+                         os.path.join(self.tmp_dir,"blanks"))
+        self.assertEqual(jobs[0].kwargs["blank_file"],
+                         [os.path.join(self.tmp_dir,"b1.dat"),
+                          os.path.join(self.tmp_dir,"b2.dat")])
+        self.assertEqual(jobs[0].input_file,
+                         os.path.join(self.tmp_dir,"a.dat"))
+
+
+class ProcessJobTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.kwargs = {"num_residues":143,"molec_weight":16116.0,
+                       "protein_conc":50.0,"path_length":1.0}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testUnexpectedError(self):
+        """
+        An unexpected exception is recorded in the result, not raised.
+        """
+
+        kwargs = dict(self.kwargs,protein_conc=0)
+        job = batch.Job(os.path.join(TEST_FILES,"cd_base.dat"),kwargs)
+        result = batch.processJob(job,self.tmp_dir)
+
+        self.assertEqual(result.output_file,None)
+        self.assertTrue(result.error.startswith("ZeroDivisionError"))
+
+    def testOrder(self):
+        """
+        Results come back in the order of the jobs, with one progress call
+        per job, whether or not the jobs succeed.
+        """
+
+        input_files = ["cd_base.dat","missing.dat","cd_wavelength.dat"]
+        jobs = [batch.Job(os.path.join(TEST_FILES,f),self.kwargs)
+                for f in input_files]
+
+        for processes in (1,2):
+            calls = []
+            progress = lambda done, total, result: calls.append(done)
+            output_dir = os.path.join(self.tmp_dir,str(processes))
+            results = batch.processJobs(jobs,output_dir,{},processes,
+                                        progress)
+
+            self.assertEqual([r.input_file for r in results],
+                             [j.input_file for j in jobs])
+            self.assertEqual([r.error == None for r in results],
+                             [True,False,True])
+            self.assertEqual(calls,[1,2,3])
+
+            # Stage profiles come back from the worker processes too
+            profile = batch.mergeProfiles([r.profile for r in results])
+            self.assertEqual(profile["MME"][0],2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+__description__ = \
+"""
+Tests for the blank cache and blank libraries in aviv/blanks.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, blanks
+from aviv.errors import AvivError
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class BlankCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.blank_file = os.path.join(TEST_FILES,"cd_wavelength-blank.dat")
+        self.cache = blanks.BlankCache()
+
+    def testOwnedArrays(self):
+        """
+        A cached blank holds its own x and signal arrays rather than views
+        of all of the data of its file.
+        """
+
+        for blank_files in (self.blank_file,[self.blank_file]*2):
+            blank = self.cache.get(blank_files)
+            self.assertTrue(blank.x.base is None)
+            self.assertTrue(blank.signal.base is None)
+
+    def testHit(self):
+        """
+        A blank is only read once.
+        """
+
+        self.assertTrue(self.cache.get(self.blank_file) is
+                        self.cache.get(self.blank_file))
+
+
+class BlankLibraryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.blank_dir = tempfile.mkdtemp()
+        self.sample_file = os.path.join(self.blank_dir,"cd_wavelength.dat")
+        self.blank_file = os.path.join(self.blank_dir,"blank.dat")
+        shutil.copy(os.path.join(TEST_FILES,"cd_wavelength.dat"),
+                    self.sample_file)
+        shutil.copy(os.path.join(TEST_FILES,"cd_wavelength-blank.dat"),
+                    self.blank_file)
+
+        self.kwargs = {"num_residues":143,"molec_weight":16116.0,
+                       "protein_conc":50.0,"path_length":1.0}
+        blanks.blank_cache.clear()
+        blanks.libraries.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.blank_dir)
+
+    def writeFile(self,name,lines,mtime=None):
+        path = os.path.join(self.blank_dir,name)
+        f = open(path,'w')
+        f.writelines(lines)
+        f.close()
+        if mtime != None:
+            os.utime(path,(mtime,mtime))
+        return path
+
+    def find(self,library):
+        sample = parsers.preParse(self.sample_file)
+        return library.find(sample)
+
+    def testSampleExcluded(self):
+        """
+        A sample in the blank directory is not found as its own blank.
+        """
+
+        library = blanks.BlankLibrary(self.blank_dir)
+        self.assertEqual(self.find(library),[self.blank_file])
+
+    def testProcessWithBlankDir(self):
+        """
+        Processing with blank_dir gives the same output as naming the blank.
+        """
+
+        by_dir = parsers.CD_Wavelength()
+        by_dir.processFile(input_file=self.sample_file,
+                           blank_dir=self.blank_dir,**self.kwargs)
+
+        by_file = parsers.CD_Wavelength()
+        by_file.processFile(input_file=self.sample_file,
+                            blank_file=self.blank_file,**self.kwargs)
+
+        self.assertEqual(by_dir.finalOutput(),by_file.finalOutput())
+
+    def testUnreadableFiles(self):
+        """
+        Half-written and junk files are left out of the index.
+        """
+
+        lines = open(self.blank_file).readlines()
+        self.writeFile("partial.dat",lines[:100])
+        self.writeFile("junk.dat",["not an Aviv file\n"])
+
+        library = blanks.BlankLibrary(self.blank_dir)
+        self.assertEqual(self.find(library),[self.blank_file])
+
+    def testRewrittenInPlace(self):
+        """
+        A file that is rewritten in place is read again, even though the
+        directory has not changed.
+        """
+
+        lines = open(self.blank_file).readlines()
+        second = self.writeFile("second.dat",lines[:100],0)
+        os.utime(self.blank_dir,(100,100))
+
+        library = blanks.BlankLibrary(self.blank_dir)
+        self.assertEqual(self.find(library),[self.blank_file])
+
+        self.writeFile("second.dat",lines,1)
+        os.utime(self.blank_dir,(100,100))
+        self.assertEqual(self.find(library),[self.blank_file])
+
+        library.refresh()
+        self.assertEqual(self.find(library),sorted([self.blank_file,second]))
+
+    def testRecheckInterval(self):
+        """
+        Files are checked again once recheck_interval has passed.
+        """
+
+        lines = open(self.blank_file).readlines()
+        second = self.writeFile("second.dat",lines[:100],0)
+        os.utime(self.blank_dir,(100,100))
+
+        library = blanks.BlankLibrary(self.blank_dir,recheck_interval=0)
+        self.assertEqual(self.find(library),[self.blank_file])
+
+        self.writeFile("second.dat",lines,1)
+        os.utime(self.blank_dir,(100,100))
+        self.assertEqual(self.find(library),sorted([self.blank_file,second]))
+
+    def testLookupCost(self):
+        """
+        Once the index is built, a lookup does not look at the files, and
+        building it does not read any blank into the blank cache.
+        """
+
+        library = blanks.BlankLibrary(self.blank_dir)
+        self.find(library)
+        self.assertEqual(blanks.blank_cache.entries,{})
+
+        calls = []
+        def fileSignature(blank_file):
+            calls.append(blank_file)
+        blanks.blank_cache.fileSignature = fileSignature
+        try:
+            for i in range(5):
+                self.assertEqual(self.find(library),[self.blank_file])
+        finally:
+            del blanks.blank_cache.fileSignature
+
+        self.assertEqual(calls,[])
+
+    def testSeveralMatches(self):
+        """
+        Several matching blanks are only averaged if asked for.
+        """
+
+        shutil.copy(self.blank_file,os.path.join(self.blank_dir,"b2.dat"))
+
+        parser = parsers.CD_Wavelength()
+        self.assertRaises(AvivError,parser.processFile,
+                          input_file=self.sample_file,
+                          blank_dir=self.blank_dir,**self.kwargs)
+
+        parser = parsers.CD_Wavelength()
+        parser.processFile(input_file=self.sample_file,
+                           blank_dir=self.blank_dir,blank_average=True,
+                           **self.kwargs)
+
+        by_file = parsers.CD_Wavelength()
+        by_file.processFile(input_file=self.sample_file,
+                            blank_file=self.blank_file,**self.kwargs)
+        self.assertEqual(list(parser.channel_list[0].MME),
+                         list(by_file.channel_list[0].MME))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+__description__ = \
+"""
+Tests for the parse caches in aviv/cache.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, instruments, cache
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class MemoryCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir,"cd_gdn.dat")
+        shutil.copy(os.path.join(TEST_FILES,"cd_gdn.dat"),self.input_file)
+        self.cache = cache.MemoryCache()
+        cache.setDefaultCache(self.cache)
+
+    def tearDown(self):
+        cache.setDefaultCache(None)
+        shutil.rmtree(self.tmp_dir)
+
+    def testHit(self):
+        """
+        A file read through the default cache is served from it afterwards.
+        """
+
+        parsers.preParse(self.input_file)
+        self.assertNotEqual(self.cache.get(self.input_file),None)
+
+    def testChangedFile(self):
+        """
+        An entry is dropped once the file changes.
+        """
+
+        parsers.preParse(self.input_file)
+        f = open(self.input_file,'a')
+        f.write("\n")
+        f.close()
+        self.assertEqual(self.cache.get(self.input_file),None)
+
+    def testGrowsWhileRead(self):
+        """
+        A file appended to while it is being read is not cached as valid.
+        """
+
+        input_file = self.input_file
+        load_file = instruments.Aviv.loadFile
+
+        def loadAndAppend(self,*args,**kwargs):
+            load_file(self,*args,**kwargs)
+            f = open(input_file,'a')
+            f.write("\n")
+            f.close()
+
+        instruments.Aviv.loadFile = loadAndAppend
+        try:
+            parser = parsers.available_parsers[("CD","Titration")]()
+            parser.extractFile(input_file=input_file,num_residues=1,
+                               molec_weight=1.,protein_conc=1.,
+                               path_length=1.)
+        finally:
+            instruments.Aviv.loadFile = load_file
+
+        self.assertEqual(self.cache.get(input_file),None)
+
+
+class ParseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(TEST_FILES,"atf_gdn.dat")
+        self.cache = cache.ParseCache(os.path.join(self.tmp_dir,"cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testRoundTrip(self):
+        """
+        An entry read back from disk holds the same data as the file.
+        """
+
+        raw = parsers.preParse(self.input_file).raw
+        self.cache.put(raw)
+        cached = self.cache.get(self.input_file)
+        self.assertEqual(cached.config_lines,raw.config_lines)
+        self.assertTrue((cached.blocks == raw.blocks).all())
+
+    def testStaleSignature(self):
+        """
+        An entry stored with the signature of an older version of the file
+        is not served.
+        """
+
+        raw = parsers.preParse(self.input_file).raw
+        signature = self.cache.fileSignature(self.input_file)
+        signature["size"] -= 1
+        self.cache.put(raw,signature)
+        self.assertEqual(self.cache.get(self.input_file),None)
+
+    def testUnreadableFile(self):
+        """
+        With check_hash, a file that can no longer be read is a miss rather
+        than an error.
+        """
+
+        input_file = os.path.join(self.tmp_dir,"atf_gdn.dat")
+        shutil.copy(self.input_file,input_file)
+        hash_cache = cache.ParseCache(os.path.join(self.tmp_dir,"cache"),
+                                      check_hash=True)
+        hash_cache.put(parsers.preParse(input_file).raw)
+
+        # Replace the file with something that can be stat'ed but not read
+        os.remove(input_file)
+        os.mkdir(input_file)
+        self.assertEqual(hash_cache.get(input_file),None)
+        self.assertFalse(os.path.exists(hash_cache.entryFile(input_file)))
+
+
+if __name__ == "__main__":
+    unittest.main()
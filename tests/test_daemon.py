@@ -0,0 +1,56 @@
+__description__ = \
+"""
+Tests for request processing in aviv/daemon.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, daemon
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class ProcessRequestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.kwargs = {"num_residues":143,"molec_weight":16116.0,
+                       "protein_conc":50.0,"path_length":1.0}
+
+    def testText(self):
+        """
+        A good request returns the output text.
+        """
+
+        reply = daemon.processRequest({"input_file":
+                                       os.path.join(TEST_FILES,"cd_base.dat"),
+                                       "kwargs":self.kwargs})
+        self.assertEqual(reply["error"],None)
+        self.assertEqual(reply["instrument"],"CD")
+        self.assertTrue(len(reply["output"]) > 0)
+
+    def testUnexpectedError(self):
+        """
+        An unexpected exception is returned as an error.
+        """
+
+        kwargs = dict(self.kwargs,protein_conc=0)
+        reply = daemon.processRequest({"input_file":
+                                       os.path.join(TEST_FILES,"cd_base.dat"),
+                                       "kwargs":kwargs})
+        self.assertTrue(reply["error"].startswith("ZeroDivisionError"))
+
+    def testBadRequest(self):
+        """
+        A request without an input file is returned as an error.
+        """
+
+        reply = daemon.processRequest({"kwargs":self.kwargs})
+        self.assertTrue(reply["error"].startswith("Request is not valid"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+__description__ = \
+"""
+Tests that each module of the aviv package can be imported on its own.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, subprocess, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import_modules = ["base","instruments","experiments","parsers","tokenizer",
+                  "cache","summary","stages","blanks","batch","watch",
+                  "daemon","errors"]
+
+class ImportTests(unittest.TestCase):
+
+    def testImportAlone(self):
+        """
+        Each module is imported in a fresh interpreter, without anything
+        else from the package having been imported first.
+        """
+
+        for module in import_modules:
+            code = "import sys; sys.path.insert(0,%r); import aviv.%s" % \
+                (ROOT,module)
+            process = subprocess.Popen([sys.executable,"-c",code],
+                                       stderr=subprocess.PIPE)
+            error = process.communicate()[1]
+            self.assertEqual(process.returncode,0,"%s: %s" % (module,error))
+
+    def testLazyPackage(self):
+        """
+        Importing the package does not import its submodules (or numpy);
+        they are imported when first used as attributes.
+        """
+
+        code = "import sys; sys.path.insert(0,%r); import aviv; " % ROOT + \
+               "assert 'numpy' not in sys.modules; " + \
+               "assert 'aviv.parsers' not in sys.modules; " + \
+               "assert aviv.parsers.preParse; " + \
+               "assert 'aviv.parsers' in sys.modules"
+        process = subprocess.Popen([sys.executable,"-c",code],
+                                   stderr=subprocess.PIPE)
+        error = process.communicate()[1]
+        self.assertEqual(process.returncode,0,error)
+
+
+if __name__ == "__main__":
+    unittest.main()
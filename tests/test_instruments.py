@@ -0,0 +1,120 @@
+__description__ = \
+"""
+Tests for reading Aviv files in aviv/instruments.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, unittest
+import numpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, instruments
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class BlockTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = parsers.preParse(os.path.join(TEST_FILES,
+                                                    "cd_wavelength_multi.dat"))
+
+    def testBlocks(self):
+        """
+        Every data block of the file is read.
+        """
+
+        self.assertEqual(self.parser.cd_signal_blocks.shape[0],3)
+        self.assertEqual(self.parser.cd_signal_blocks.shape[1],
+                         len(self.parser.cd_signal))
+
+    def testMean(self):
+        """
+        Signal columns are the mean of the blocks.
+        """
+
+        blocks = self.parser.cd_signal_blocks
+        self.assertTrue(numpy.allclose(self.parser.cd_signal,
+                                       numpy.mean(blocks,axis=0),
+                                       rtol=1e-14,atol=0))
+
+    def testErrorPropagation(self):
+        """
+        Error columns are the root-sum-square of the blocks.
+        """
+
+        blocks = self.parser.cd_err_blocks
+        self.assertTrue(numpy.allclose(self.parser.cd_err,
+                                       numpy.sqrt(numpy.sum(blocks**2,axis=0)),
+                                       rtol=1e-14,atol=0))
+
+    def testSpread(self):
+        """
+        The std and median of the blocks are only worked out when asked for.
+        """
+
+        self.assertFalse("cd_signal_std" in self.parser.__dict__)
+        self.assertFalse("cd_signal_median" in self.parser.__dict__)
+
+        blocks = self.parser.cd_signal_blocks
+        self.assertTrue(numpy.allclose(self.parser.cd_signal_std,
+                                       numpy.std(blocks,axis=0),
+                                       rtol=1e-12,atol=1e-15))
+        self.assertTrue(numpy.array_equal(self.parser.cd_signal_median,
+                                          numpy.median(blocks,axis=0)))
+        self.assertTrue("cd_signal_std" in self.parser.__dict__)
+
+        self.assertRaises(AttributeError,getattr,self.parser,"missing_std")
+
+
+class ChannelMemoryTests(unittest.TestCase):
+
+    def testOwnedArrays(self):
+        """
+        The arrays a channel starts from are its own, not views of every
+        column of the file.
+        """
+
+        for input_file in sorted(os.listdir(TEST_FILES)):
+            parser = parsers.preParse(os.path.join(TEST_FILES,input_file))
+            for c in parser.channel_list:
+                for name in ("raw_x","raw_signal","raw_err","concentrations",
+                             "dark_signal","qc_signal","shot_size"):
+                    value = getattr(c,name)
+                    if isinstance(value,numpy.ndarray):
+                        self.assertTrue(value.base is None,
+                                        "%s %s" % (input_file,name))
+
+class MetadataTests(unittest.TestCase):
+
+    def testMatchesFullParse(self):
+        """
+        The metadata of each file (read without its data) are the same as
+        the configuration found by reading the whole file.
+        """
+
+        for input_file in sorted(os.listdir(TEST_FILES)):
+            input_file = os.path.join(TEST_FILES,input_file)
+            record = parsers.readMetadata(input_file)
+
+            unknown = instruments.Unknown(input_file)
+            parser = parsers.available_parsers[unknown.identifyExperiment()]()
+            parser.input_file = input_file
+            parser.loadFile()
+            parser.config_extract = parser.metadataAttributes()
+            parser.extractConfiguration()
+
+            self.assertEqual(record["instrument"],parser.instrument)
+            self.assertEqual(record["exp_type"],parser.exp_type)
+            for c in parser.config_extract:
+                self.assertEqual(record[c.name],c.value,
+                                 "%s: %s" % (input_file,c.name))
+
+            # The full parse also reads the data
+            self.assertNotEqual(len(parser.raw.blocks),0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+__description__ = \
+"""
+Tests that the processed output of the files in test_files is byte for byte
+the same as the output of the original (line by line) parser, which is kept
+in tests/expected.  The input file named in each header is given relative to
+the top of the package.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, gzip, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, base
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+EXPECTED = os.path.join(ROOT,"tests","expected")
+
+CD = {"num_residues":143,"molec_weight":16116.0,"protein_conc":50.0,
+      "path_length":1.0}
+ATF_GDN = {"sam_buf":1.0,"sam_titr":2.0,"ref_buf":1.0,"ref_titr":3.0}
+
+# (expected output, input file, kwargs)
+CASES = [("cd_gdn.out","cd_gdn.dat",
+          dict(CD,sam_buf=0.1,sam_titr=0.3,init_conc=0.1)),
+         ("cd_gdn_uncorrected.out","cd_gdn.dat",
+          dict(CD,sam_buf=0.1,sam_titr=0.3)),
+         ("cd_base.out","cd_base.dat",CD),
+         ("cd_wavelength.out","cd_wavelength.dat",
+          dict(CD,blank_file=os.path.join(TEST_FILES,
+                                          "cd_wavelength-blank.dat"))),
+         ("cd_wavelength_unblanked.out","cd_wavelength.dat",CD),
+         ("cd_wavelength_multi.out","cd_wavelength_multi.dat",
+          dict(CD,blank_file=os.path.join(TEST_FILES,
+                                          "cd_wavelength-blank.dat"))),
+         ("atf_gdn.out","atf_gdn.dat",
+          dict(ATF_GDN,sample=True,reference=True,qc_corr=True,
+               titrant_conc=6.0)),
+         ("atf_gdn_sample.out","atf_gdn.dat",
+          dict(ATF_GDN,sample=True,reference=False)),
+         ("atf_base_qc.out","atf_base.dat",
+          dict(sample=True,reference=True,qc_corr=True)),
+         ("atf_base.out","atf_base.dat",dict(sample=True,reference=True)),
+         ("atf_temperature_qc.out","atf_temperature.dat",
+          dict(sample=True,reference=True,qc_corr=True)),
+         ("atf_temperature.out","atf_temperature.dat",
+          dict(sample=True,reference=False))]
+
+def processFile(input_file,kwargs,raw=None):
+    """
+    Process a file with the parser for its experiment, returning the parser.
+    """
+
+    exp_id = parsers.instruments.Unknown(input_file).identifyExperiment()
+    parser = parsers.available_parsers[exp_id]()
+    parser.processFile(raw=raw,input_file=input_file,**kwargs)
+
+    return parser
+
+
+def relativeOutput(output):
+    """
+    Name the input file relative to the top of the package, as in the
+    expected output.
+    """
+
+    return output.replace(ROOT + os.sep,"")
+
+
+class OutputTests(unittest.TestCase):
+
+    def expected(self,name):
+        return open(os.path.join(EXPECTED,name)).read()
+
+    def testOutput(self):
+        """
+        Each file gives the expected output.
+        """
+
+        for name, input_file, kwargs in CASES:
+            parser = processFile(os.path.join(TEST_FILES,input_file),kwargs)
+            self.assertEqual(relativeOutput(parser.finalOutput()),
+                             self.expected(name),name)
+
+    def testRawOutput(self):
+        """
+        Processing from the raw parse of a file gives the same output.
+        """
+
+        for name, input_file, kwargs in CASES:
+            input_file = os.path.join(TEST_FILES,input_file)
+            raw = parsers.preParse(input_file).raw
+            parser = processFile(input_file,kwargs,raw)
+            self.assertEqual(relativeOutput(parser.finalOutput()),
+                             self.expected(name),name)
+
+    def testStreamedOutput(self):
+        """
+        Writing the output to a file as it is generated (in pieces smaller
+        than a file) gives the same output.
+        """
+
+        old_rows = base.ROWS_PER_WRITE
+        base.ROWS_PER_WRITE = 7
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for name, input_file, kwargs in CASES:
+                parser = processFile(os.path.join(TEST_FILES,input_file),
+                                     kwargs)
+                output_file = os.path.join(tmp_dir,name)
+                f = open(output_file,'w')
+                parser.writeOutput(f)
+                f.close()
+
+                self.assertEqual(relativeOutput(open(output_file).read()),
+                                 self.expected(name),name)
+        finally:
+            base.ROWS_PER_WRITE = old_rows
+            shutil.rmtree(tmp_dir)
+
+    def testLiveOutput(self):
+        """
+        Following a file while it is written in chunks (see startLive and
+        refresh) gives the same output as processing the finished file.
+        """
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for name, input_file, kwargs in CASES:
+                input_file = os.path.join(TEST_FILES,input_file)
+                data = open(input_file,'rb').read()
+                live_file = os.path.join(tmp_dir,os.path.basename(input_file))
+
+                # Start once the first data have been written
+                position = data.index("$DATA") + 200
+                f = open(live_file,'wb')
+                f.write(data[:position])
+                f.close()
+
+                exp_id = parsers.preParse(input_file).exp_id
+                parser = parsers.available_parsers[exp_id]()
+                parser.startLive(input_file=live_file,**kwargs)
+                while position < len(data):
+                    f = open(live_file,'ab')
+                    f.write(data[position:position + 1000])
+                    f.close()
+                    position += 1000
+                    parser.refresh()
+
+                output = parser.finalOutput().replace(live_file,input_file)
+                self.assertEqual(relativeOutput(output),self.expected(name),
+                                 name)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def testCompressed(self):
+        """
+        A gzipped file gives the same output as the file itself.
+        """
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            input_file = os.path.join(tmp_dir,"cd_gdn.dat.gz")
+            f = gzip.open(input_file,'wb')
+            f.write(open(os.path.join(TEST_FILES,"cd_gdn.dat"),'rb').read())
+            f.close()
+
+            name, kwargs = CASES[0][0], CASES[0][2]
+            output = processFile(input_file,kwargs).finalOutput()
+            output = output.replace(input_file,
+                                    os.path.join("test_files","cd_gdn.dat"))
+            self.assertEqual(output,self.expected(name))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
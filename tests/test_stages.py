@@ -0,0 +1,95 @@
+__description__ = \
+"""
+Tests for the processing stages in aviv/stages.py and the fused steps they
+run.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, stages
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class PipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.kwargs = {"input_file":os.path.join(TEST_FILES,"cd_gdn.dat"),
+                       "num_residues":143,"molec_weight":16116.0,
+                       "protein_conc":50.0,"path_length":1.0,
+                       "sam_buf":0.1,"sam_titr":0.3,"init_conc":0.1}
+
+    def processFile(self,fuse_steps):
+        parser = parsers.CD_Titration()
+        parser.fuse_steps = fuse_steps
+        parser.processFile(**self.kwargs)
+        return parser
+
+    def testFusedMatchesUnfused(self):
+        """
+        Fusing the steps gives exactly the same output.
+        """
+
+        fused = self.processFile(True)
+        unfused = self.processFile(False)
+
+        self.assertEqual(fused.finalOutput(),unfused.finalOutput())
+        for name in ("dilution_corr_signal","MME","norm_signal"):
+            self.assertEqual(list(getattr(fused.channel_list[0],name)),
+                             list(getattr(unfused.channel_list[0],name)))
+
+    def processKeeping(self,fuse_steps,names):
+        """
+        Process the file, holding on to only the signals in names.
+        """
+
+        parser = parsers.CD_Titration()
+        parser.fuse_steps = fuse_steps
+        parser.extractFile(**self.kwargs)
+        for c in parser.channel_list:
+            c.keep(names)
+        parser.processChannels(**self.kwargs)
+        return parser
+
+    def testRecomputedIntermediates(self):
+        """
+        Signals dropped by a fused run are recomputed exactly as an unfused
+        run that kept them saved them.
+        """
+
+        names = ["corr_signal","dilution_corr_signal","MME","MME_err"]
+        fused = self.processKeeping(True,[])
+        unfused = self.processKeeping(False,names)
+
+        for fused_channel, unfused_channel in zip(fused.channel_list,
+                                                  unfused.channel_list):
+            for name in names:
+                value = fused_channel.history[name][2]
+                if value != None:
+                    self.assertTrue(value() is None,name)
+                self.assertEqual(list(fused_channel.intermediate(name)),
+                                 list(unfused_channel.history[name][2]),name)
+
+    def testProfile(self):
+        """
+        Each stage of the pipeline is recorded once per channel, fused or
+        not.
+        """
+
+        for fuse_steps in (True,False):
+            start = stages.stageProfile()
+            parser = self.processFile(fuse_steps)
+            profile = stages.profileSince(start)
+
+            self.assertEqual(sorted(profile.keys()),sorted(parser.pipeline))
+            for runs, seconds in profile.values():
+                self.assertEqual(runs,len(parser.channel_list))
+                self.assertTrue(seconds >= 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+__description__ = \
+"""
+Tests for the $SUMMARY parser in aviv/summary.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import summary
+
+SUMMARY_LINES = ["Averaging Time       :   1.0 sec.",
+                 "QC Correction is ENABLED",
+                 "Stirring is DISABLED",
+                 "Concentration Schedule...",
+                 "Target Concentration : 1.8    3    4",
+                 "Stir Time            :  5.00 40.00  5.00 mins.",
+                 "Temperature          :  25.00 deg C",
+                 "Domain 1: 0 molar -> 2 molar  in 0.1 molar steps:",
+                 "Stir during measurments",
+                 "Method               : titration",
+                 "Data Sets saved in this file :",
+                 "Sample Signal",
+                 "Ref. Sig."]
+
+class SummaryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.summary = summary.Summary(SUMMARY_LINES)
+
+    def testValues(self):
+        """
+        Values are converted to numbers where they can be, with units.
+        """
+
+        self.assertEqual(self.summary.get("Averaging Time"),1.0)
+        self.assertEqual(self.summary.unit("Averaging  Time"),"sec.")
+        self.assertEqual(self.summary.get("Method"),"titration")
+        self.assertEqual(self.summary.unit("Method"),None)
+        self.assertEqual(self.summary.get("Missing",0),0)
+
+    def testFlags(self):
+        """
+        ENABLED and DISABLED lines become flags.
+        """
+
+        self.assertEqual(self.summary.flag("QC Correction"),True)
+        self.assertEqual(self.summary.flag("Stirring"),False)
+        self.assertEqual(self.summary.flag("Missing",False),False)
+
+    def testSchedule(self):
+        """
+        The multi-valued rows after the schedule heading form the schedule.
+        """
+
+        self.assertEqual(self.summary.schedule,
+                         {"Target Concentration":[1.8,3,4],
+                          "Stir Time":[5.0,40.0,5.0]})
+        self.assertEqual(self.summary.get("Temperature"),25.0)
+
+    def testDomainsAndDataSets(self):
+        """
+        Domains, data sets and notes are collected.
+        """
+
+        self.assertEqual(self.summary.domains,[(0,2,0.1,"molar")])
+        self.assertEqual(self.summary.data_sets,["Sample Signal","Ref. Sig."])
+        self.assertEqual(self.summary.notes,["Stir during measurments"])
+
+
+if __name__ == "__main__":
+    unittest.main()
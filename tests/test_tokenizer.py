@@ -0,0 +1,126 @@
+__description__ = \
+"""
+Tests for the streaming tokenizer in aviv/tokenizer.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import tokenizer
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+def readEvents(input_file,skip_data=False):
+    """
+    Return the list of events tokenize generates for a file.
+    """
+
+    f = open(input_file,'rb')
+    try:
+        return list(tokenizer.tokenize(f,skip_data))
+    finally:
+        f.close()
+
+
+class TokenizeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.input_file = os.path.join(TEST_FILES,"cd_gdn.dat")
+        self.events = readEvents(self.input_file)
+
+    def testSections(self):
+        """
+        The sections of a file come out in order, and each event starts at
+        the line that opened it.
+        """
+
+        names = [e[0] for e in self.events]
+        self.assertEqual(names[:2],[tokenizer.SUMMARY,tokenizer.DATA])
+        self.assertEqual(names[-2:],[tokenizer.ENDDATA,
+                                     tokenizer.CONFIGURATION])
+        self.assertTrue(tokenizer.BLOCK in names)
+
+        contents = open(self.input_file,'rb').read()
+        for event, offset, payload in self.events:
+            self.assertTrue(contents[offset:].startswith(event))
+
+    def testSkipData(self):
+        """
+        Skipping the data gives the same summary and configuration.
+        """
+
+        sections = [tokenizer.SUMMARY,tokenizer.CONFIGURATION]
+        skipped = readEvents(self.input_file,skip_data=True)
+        self.assertEqual([e for e in self.events if e[0] in sections],
+                         [e for e in skipped if e[0] in sections])
+        self.assertFalse(tokenizer.BLOCK in [e[0] for e in skipped])
+
+    def testFindConfiguration(self):
+        """
+        The configuration is found whatever the size of the chunks read.
+        """
+
+        f = open(self.input_file,'rb')
+        try:
+            offsets = [tokenizer.findConfiguration(f,size)
+                       for size in (5,16,4096,1 << 20)]
+        finally:
+            f.close()
+
+        self.assertEqual(set(offsets),set([self.events[-1][1]]))
+
+    def testIndexConfiguration(self):
+        """
+        Keys map to the text after the first ":"; the last value wins.
+        """
+
+        index = tokenizer.indexConfiguration(["$MDY:10:15:2004","$A:1",
+                                              "$A:2","$FLAG"])
+        self.assertEqual(index,{"$MDY":"10:15:2004","$A":"2","$FLAG":None})
+
+
+class TailTokenizerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir,"cd_gdn.dat")
+        self.contents = open(os.path.join(TEST_FILES,"cd_gdn.dat"),
+                             'rb').read()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testGrowingFile(self):
+        """
+        Reading a file as it grows, in pieces that split lines, finds the
+        same rows and configuration as reading it whole.
+        """
+
+        tail = tokenizer.TailTokenizer()
+        rows = {}
+        config = None
+        for end in range(0,len(self.contents) + 1001,1001):
+            f = open(self.input_file,'wb')
+            f.write(self.contents[:end])
+            f.close()
+
+            f = open(self.input_file,'rb')
+            for event, offset, payload in tail.read(f):
+                if event == tokenizer.ROWS:
+                    rows.setdefault(offset,[]).extend(payload[1])
+                elif event == tokenizer.CONFIGURATION:
+                    config = payload
+            f.close()
+
+        events = readEvents(self.input_file)
+        self.assertEqual(rows,dict([(e[1],e[2][1]) for e in events
+                                    if e[0] == tokenizer.BLOCK]))
+        self.assertEqual(config,events[-1][2])
+
+
+if __name__ == "__main__":
+    unittest.main()
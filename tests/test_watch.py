@@ -0,0 +1,80 @@
+__description__ = \
+"""
+Tests for the directory watcher in aviv/watch.py.
+"""
+__author__ = "Michael J. Harms"
+__date__ = ""
+
+import os, sys, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+from aviv import parsers, instruments, batch, watch
+from aviv.errors import AvivError
+
+TEST_FILES = os.path.join(ROOT,"test_files")
+
+class WatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir,"cd_gdn.dat")
+        self.defaults = {"num_residues":143,"molec_weight":16116.0,
+                         "protein_conc":50.0,"path_length":1.0,
+                         "sam_buf":0.1,"sam_titr":0.3}
+        self.reported = []
+        self.watcher = watch.Watcher(self.tmp_dir,defaults=self.defaults,
+                                     settle_time=0,process_existing=True,
+                                     report=self.reported.append,
+                                     use_inotify=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def writePart(self,num_lines):
+        lines = open(os.path.join(TEST_FILES,"cd_gdn.dat")).readlines()
+        f = open(self.input_file,'w')
+        f.writelines(lines[:num_lines])
+        f.close()
+
+    def testPartialFile(self):
+        """
+        A file without all of its configuration can't be identified yet; it
+        is skipped and picked up once it is finished.
+        """
+
+        self.writePart(100)
+        self.assertRaises(AvivError,instruments.Unknown,self.input_file)
+        self.assertEqual(self.watcher.check(),[])
+
+        shutil.copy(os.path.join(TEST_FILES,"cd_gdn.dat"),self.input_file)
+        os.utime(self.input_file,(0,0))
+        results = self.watcher.check()
+        self.assertEqual(len(results),1)
+        self.assertEqual(results[0].error,None)
+        self.assertTrue(os.path.isfile(results[0].output_file))
+
+    def testUnexpectedError(self):
+        """
+        An unexpected exception is reported and the file skipped.
+        """
+
+        def processJob(*args):
+            raise RuntimeError("broken")
+
+        shutil.copy(os.path.join(TEST_FILES,"cd_gdn.dat"),self.input_file)
+        old_processJob = batch.processJob
+        batch.processJob = processJob
+        try:
+            results = self.watcher.check()
+        finally:
+            batch.processJob = old_processJob
+
+        self.assertEqual([r.error for r in results],["RuntimeError: broken"])
+        self.assertEqual(self.reported,results)
+        self.assertEqual(self.watcher.check(),[])
+
+
+if __name__ == "__main__":
+    unittest.main()
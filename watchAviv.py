@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+__author__ = "Michael J. Harms"
+__date__ = ""
+__version__= "0.3"
+__description__ = \
+"""
+Watch a directory that the instruments write to and process each new
+experiment file as soon as it is finished, using the defaults (and
+per-instrument defaults) of a JSON job spec (see aviv/batch.py).
+"""
+
+# Import python standard modules
+import sys, os
+from optparse import OptionParser
+
+# Import program modules
+import aviv
+from aviv import batch, watch
+from aviv.parsers import AvivError
+
+def main(argv=None):
+    """
+    Parse the command line and watch the directory until interrupted.
+    """
+
+    if argv == None:
+        argv = sys.argv[1:]
+
+    usage = "%prog [options] watch_dir [job_spec.json]"
+    option_parser = OptionParser(usage=usage,description=__description__)
+    option_parser.add_option("-o","--output-dir",dest="output_dir",
+                             help="write output files to OUTPUT_DIR")
+    option_parser.add_option("-e","--existing",dest="process_existing",
+                             default=False,action="store_true",
+                             help="also process files already in watch_dir")
+    option_parser.add_option("-s","--settle-time",dest="settle_time",
+                             type="float",default=0.5,
+                             help="seconds a file must be unchanged before "
+                                  "it is processed")
+    option_parser.add_option("-p","--poll",dest="poll_interval",type="float",
+                             default=0.25,
+                             help="seconds between checks for new files")
+    options, args = option_parser.parse_args(argv)
+
+    if len(args) not in (1,2):
+        option_parser.error("a directory to watch must be given")
+
+    defaults = {}
+    instrument_defaults = {}
+    output_dir = None
+    try:
+        if len(args) == 2:
+            spec_jobs, defaults, output_dir, instrument_defaults = \
+                batch.readJobSpec(args[1])
+        if options.output_dir != None:
+            output_dir = options.output_dir
+
+        watcher = watch.Watcher(args[0],output_dir,defaults,
+                                instrument_defaults,options.settle_time,
+                                options.poll_interval,
+                                options.process_existing,report)
+    except AvivError, value:
+        print >> sys.stderr, value
+        return 1
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+def report(result):
+    """
+    Print what happened to each file that was processed.
+    """
+
+    if result.error != None:
+        print >> sys.stderr, "%s: %s" % (result.input_file,result.error)
+    else:
+        print "%s -> %s" % (result.input_file,result.output_file)
+    sys.stdout.flush()
+
+if __name__ == "__main__":
+    sys.exit(main())